@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+import yaml
+from chess.engine import Limit
+from tiers import rating_tier, time_control_tier
+
+# tiers run 0 (bullet, under 1500) to 3 (classical, over 1750)
+TOP_TIER = 3
+
+
+@dataclass(frozen = True)
+class Tiers:
+    time_control: Optional[int] = None
+    # of the weaker player, their mistakes are the ones that make puzzles
+    rating: Optional[int] = None
+
+    @classmethod
+    def from_headers(cls, lines: Iterable[str]) -> "Tiers":
+        """ Tiers of a game's raw header lines, None for a header the game doesn't have """
+        time_control = None
+        ratings = []
+        for line in lines:
+            tier = time_control_tier(line)
+            if tier is not None:
+                time_control = tier
+            tier = rating_tier(line)
+            if tier is not None:
+                ratings.append(tier)
+        return cls(time_control, min(ratings) if ratings else None)
+
+    @property
+    def budget_tier(self) -> int:
+        """ The lower of the two tiers, games missing both count as top tier """
+        known = [tier for tier in (self.time_control, self.rating) if tier is not None]
+        return min(known) if known else TOP_TIER
+
+
+@dataclass
+class Admission:
+    """
+    Which games get analysed, in which order and with how much engine.
+    Games below either minimum tier are dropped, a missing header passes.
+    limits maps a budget tier to its engine limit, tiers without one get the full search.
+    """
+    min_time_control: int = 0
+    min_rating: int = 0
+    # share of plies that need an eval
+    min_eval_coverage: float = 0.0
+    limits: Dict[int, Limit] = field(default_factory = dict)
+
+    def admit(self, tiers: Tiers) -> bool:
+        return (
+            (tiers.time_control is None or tiers.time_control >= self.min_time_control)
+            and (tiers.rating is None or tiers.rating >= self.min_rating)
+        )
+
+    def covered(self, plies: int, evals: int) -> bool:
+        return evals >= self.min_eval_coverage * plies
+
+    def priority(self, tiers: Tiers, plies: int, evals: int) -> Tuple[float, float]:
+        """ Higher first: the sum of time control and rating tiers, then how much of the game has evals """
+        coverage = evals / plies if plies else 0.0
+        return (
+            (TOP_TIER if tiers.time_control is None else tiers.time_control)
+            + (TOP_TIER if tiers.rating is None else tiers.rating),
+            coverage,
+        )
+
+    def limit(self, tiers: Tiers) -> Optional[Limit]:
+        return self.limits.get(tiers.budget_tier)
+
+
+def load_admission(path: str) -> Admission:
+    """
+    Reads an Admission from YAML, limits keyed by budget tier:
+    limits: {0: {nodes: 1000000}, 1: {depth: 18, time: 5}}
+    """
+    with open(path, encoding="utf-8") as f:
+        settings = yaml.safe_load(f) or {}
+    limits = {int(tier): Limit(**limit) for tier, limit in (settings.pop("limits", None) or {}).items()}
+    return Admission(limits = limits, **settings)
@@ -0,0 +1,209 @@
+import pickle
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from chess import Board
+from chess.engine import Limit
+from features import attack_maps, bitboards_from_boards
+from tags import TAGS
+
+try:
+    from sklearn.linear_model import LogisticRegression
+except ImportError:  # scikit-learn is optional, the generator runs ungated without it
+    LogisticRegression = None
+
+SKIP, SHALLOW, FULL = "skip", "shallow", "full"
+# budget of candidates the gate isn't sure about
+shallow_limit = Limit(depth = 12, nodes = 300_000)
+# share of the puzzles the thresholds keep on the training set
+FULL_RECALL = 0.9
+SHALLOW_RECALL = 0.99
+# tags with fewer training puzzles than this get no model
+MIN_TAG_SAMPLES = 20
+
+FEATURE_NAMES = (
+    "swing", "ply", "in_check", "legal_moves", "checks", "captures",
+    "material", "material_balance", "hanging_theirs", "hanging_ours",
+)
+PIECE_VALUES = np.array([1, 3, 3, 5, 9, 0], dtype = np.float32)
+
+
+def _popcounts(bitboards: np.ndarray) -> np.ndarray:
+    return np.unpackbits(bitboards.astype("<u8").view(np.uint8).reshape(*bitboards.shape, 8), axis = -1).sum(axis = -1)
+
+
+def cheap_features(boards: Sequence[Board], swings: Sequence[float]) -> np.ndarray:
+    """
+    (n, len(FEATURE_NAMES)) float32 rows of a candidate position, from the side to move's point of view.
+    Costs a legal move generation and a few bitboard ops, nothing close to a search.
+    """
+    bitboards = bitboards_from_boards(boards)
+    maps = attack_maps(bitboards)
+    white_to_move = np.array([board.turn for board in boards], dtype = bool)
+    # (n, 2, 6): ours then theirs
+    ours_first = np.where(white_to_move[:, None, None], bitboards.reshape(-1, 2, 6), bitboards.reshape(-1, 2, 6)[:, ::-1])
+    our_attacks = np.where(white_to_move, maps[:, 0], maps[:, 1])
+    their_attacks = np.where(white_to_move, maps[:, 1], maps[:, 0])
+    counts = _popcounts(ours_first)
+    material = (counts * PIECE_VALUES).sum(axis = -1)
+    # kings can't hang
+    ours = np.bitwise_or.reduce(ours_first[:, 0, :5], axis = -1)
+    theirs = np.bitwise_or.reduce(ours_first[:, 1, :5], axis = -1)
+    hanging_theirs = _popcounts(theirs & our_attacks & ~their_attacks)
+    hanging_ours = _popcounts(ours & their_attacks & ~our_attacks)
+    rows = np.zeros((len(boards), len(FEATURE_NAMES)), dtype = np.float32)
+    rows[:, 0] = swings
+    rows[:, 6] = material.sum(axis = -1)
+    rows[:, 7] = material[:, 0] - material[:, 1]
+    rows[:, 8] = hanging_theirs
+    rows[:, 9] = hanging_ours
+    for i, board in enumerate(boards):
+        moves = list(board.legal_moves)
+        rows[i, 1] = board.ply()
+        rows[i, 2] = board.is_check()
+        rows[i, 3] = len(moves)
+        rows[i, 4] = sum(1 for move in moves if board.gives_check(move))
+        rows[i, 5] = sum(1 for move in moves if board.is_capture(move))
+    return rows
+
+
+def precision_recall(probabilities: np.ndarray, labels: np.ndarray, threshold: float) -> Tuple[float, float]:
+    """ Of the candidates at or above threshold, and of all puzzles """
+    kept = probabilities >= threshold
+    positives = labels.astype(bool)
+    hits = np.count_nonzero(kept & positives)
+    return hits / max(np.count_nonzero(kept), 1), hits / max(np.count_nonzero(positives), 1)
+
+
+def threshold_for_recall(probabilities: np.ndarray, labels: np.ndarray, recall: float) -> float:
+    """ Highest threshold that still keeps recall of the puzzles """
+    positives = np.sort(probabilities[labels.astype(bool)])
+    if not len(positives):
+        return 0.0
+    lost = int(np.floor((1 - recall) * len(positives)))
+    return float(positives[min(lost, len(positives) - 1)])
+
+
+def benchmark(probabilities: np.ndarray, labels: np.ndarray, costs: Optional[np.ndarray] = None,
+              thresholds: Sequence[float] = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5)) -> List[Dict[str, float]]:
+    """
+    Engine time saved against puzzles lost when candidates below each threshold are skipped.
+    costs are the engine seconds each candidate took, uniform when unknown.
+    """
+    costs = np.ones(len(labels)) if costs is None else costs
+    total = costs.sum() or 1.0
+    rows = []
+    for threshold in thresholds:
+        skipped = probabilities < threshold
+        precision, recall = precision_recall(probabilities, labels, threshold)
+        rows.append({
+            "threshold": threshold,
+            "skipped": float(np.mean(skipped)) if len(skipped) else 0.0,
+            "engine_time_saved": float(costs[skipped].sum() / total),
+            "puzzles_lost": 1 - recall,
+            "precision": precision,
+            "recall": recall,
+        })
+    return rows
+
+
+class PuzzleGate:
+    """
+    Decides from cheap_features how much engine a candidate gets: skipped below skip_below,
+    searched with shallow_limit below full_from, searched fully otherwise.
+    model is anything with predict_proba, a LogisticRegression once trained.
+    """
+
+    def __init__(self, model: Any, skip_below: float, full_from: float, tag_models: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.skip_below = skip_below
+        self.full_from = full_from
+        self.tag_models = tag_models or {}
+
+    @classmethod
+    def train(cls, x: np.ndarray, labels: np.ndarray, tag_masks: Optional[np.ndarray] = None,
+              full_recall: float = FULL_RECALL, shallow_recall: float = SHALLOW_RECALL) -> "PuzzleGate":
+        if LogisticRegression is None:
+            raise ImportError("Training a PuzzleGate needs scikit-learn")
+        model = LogisticRegression(class_weight = "balanced", max_iter = 1000).fit(x, labels)
+        probabilities = model.predict_proba(x)[:, 1]
+        tag_models = {}
+        if tag_masks is not None:
+            puzzles = labels.astype(bool)
+            for i, tag in enumerate(TAGS):
+                has_tag = (tag_masks[puzzles] >> np.uint64(i)) & np.uint64(1)
+                if MIN_TAG_SAMPLES <= np.count_nonzero(has_tag) < len(has_tag):
+                    tag_models[tag] = LogisticRegression(class_weight = "balanced", max_iter = 1000).fit(x[puzzles], has_tag)
+        return cls(
+            model,
+            threshold_for_recall(probabilities, labels, shallow_recall),
+            threshold_for_recall(probabilities, labels, full_recall),
+            tag_models,
+        )
+
+    def probabilities(self, x: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(x)[:, 1]
+
+    def decide(self, board: Board, swing: float) -> str:
+        probability = self.probabilities(cheap_features([board], [swing]))[0]
+        if probability < self.skip_below:
+            return SKIP
+        return SHALLOW if probability < self.full_from else FULL
+
+    def likely_tags(self, board: Board, swing: float, threshold: float = 0.5) -> List[str]:
+        x = cheap_features([board], [swing])
+        return [tag for tag, model in self.tag_models.items() if model.predict_proba(x)[0, 1] >= threshold]
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path: str) -> "PuzzleGate":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+class CandidateLog:
+    """
+    Training rows in a candidates table of puzzles.db: the cheap_features of every fully analysed
+    candidate, whether it made a puzzle, the puzzle's tags and the engine seconds it took.
+    """
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path, check_same_thread = False)
+        self.lock = threading.Lock()
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS candidates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            features BLOB,
+            label INTEGER,
+            tag_mask INTEGER,
+            seconds REAL
+        )
+        """)
+
+    def record(self, board: Board, swing: float, puzzle: bool, tag_mask: int, seconds: float) -> None:
+        features = cheap_features([board], [swing])[0]
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO candidates (features, label, tag_mask, seconds) VALUES (?, ?, ?, ?)",
+                (features.tobytes(), int(puzzle), tag_mask, seconds)
+            )
+            self.conn.commit()
+
+    def load(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ x, labels, tag masks and engine seconds, ready for PuzzleGate.train and benchmark """
+        with self.lock:
+            rows = self.conn.execute("SELECT features, label, tag_mask, seconds FROM candidates").fetchall()
+        x = np.frombuffer(b"".join(row[0] for row in rows), dtype = np.float32).reshape(len(rows), len(FEATURE_NAMES))
+        return (
+            x,
+            np.array([row[1] for row in rows], dtype = np.int8),
+            np.array([row[2] for row in rows], dtype = np.uint64),
+            np.array([row[3] for row in rows], dtype = np.float64),
+        )
+
+    def close(self) -> None:
+        self.conn.close()
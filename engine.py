@@ -1,17 +1,147 @@
-from chess.engine import SimpleEngine, Limit
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from chess import Board, Move
+from chess.engine import SimpleEngine, Limit, InfoDict
+from profiler import profiled
+from metrics import EngineMetrics
 
 # best_move_limit = Limit(depth = 50, time = 30, nodes = 25_000_000)
 best_move_limit = Limit(depth = 20, time = 10, nodes = 10_000_000)
 
 
+# cgroup v2 then v1, "max" or a huge v1 value means no limit
+CGROUP_LIMITS = ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"]
+
+
+def cgroup_limit_mb() -> Optional[int]:
+    for path in CGROUP_LIMITS:
+        try:
+            with open(path) as f:
+                limit = f.read().strip()
+        except OSError:
+            continue
+        if limit.isdigit() and int(limit) < 1 << 60:
+            return int(limit) // (1024 * 1024)
+    return None
+
+
+def available_memory_mb() -> int:
+    """ MemAvailable, or free pages where /proc/meminfo is missing, capped by the cgroup's memory limit """
+    available = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) // 1024
+                    break
+    except OSError:
+        pass
+    if available is None:
+        available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    limit = cgroup_limit_mb()
+    return min(available, limit) if limit is not None else available
+
+
+def hash_size_mb(engines: int = 1, fraction: float = 0.5, memory_mb: Optional[int] = None) -> int:
+    """ Hash per engine: a fraction of available memory split evenly, rounded down to a power of two """
+    budget = int((memory_mb or available_memory_mb()) * fraction / engines)
+    return max(16, 1 << (budget.bit_length() - 1)) if budget else 16
+
+
+def pinned_to(cpus: Optional[List[int]]) -> dict:
+    """
+    popen arguments starting a process on cpus: set between fork and exec, so every thread
+    the engine starts later, search threads included, inherits the affinity
+    """
+    if not cpus:
+        return {}
+    return {"preexec_fn": lambda: os.sched_setaffinity(0, cpus)}
+
+
 class Engine:
-    def __init__(self, name, threads=6):
-        self.engine = SimpleEngine.popen_uci(name)
-        self.engine.configure({'Threads': threads})
-
-    def find_best_move(self, board):
-        info = self.engine.analyse(board, multipv = 1, limit = best_move_limit)
-        return info[0]["pv"][0]
-    
+    def __init__(self, name, threads=6, hash_mb: Optional[int] = None, multipv: int = 1, engines: int = 1,
+                 cpus: Optional[List[int]] = None):
+        """ Without hash_mb the engine takes its share of the hash budget split between engines """
+        self.engine = SimpleEngine.popen_uci(name, **pinned_to(cpus))
+        # Threads only once the process is pinned, its search threads start here
+        self.engine.configure({'Threads': threads, 'Hash': hash_mb or hash_size_mb(engines)})
+        self.multipv = multipv
+        self.metrics = EngineMetrics()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_profile(cls, name, profile, engines: int = 1) -> "Engine":
+        """
+        Engine configured from a profiles.EngineProfile, pinned to its cpu set if it has one.
+        A profile without hash_mb gets a share of the budget split between engines.
+        """
+        engine = cls(name, profile.threads, profile.hash_mb, profile.multipv, engines, profile.cpus)
+        if profile.syzygy_path:
+            engine.engine.configure({'SyzygyPath': profile.syzygy_path})
+        return engine
+
+    def analyse(self, board: Board, limit: Limit, multipv: Optional[int] = None, game: object = None) -> List[InfoDict]:
+        info = self.engine.analyse(board, multipv = multipv or self.multipv, limit = limit, game = game)
+        self.metrics.observe(info[0], limit)
+        return info
+
+    @profiled
+    def find_best_move(self, board: Board, game: object = None) -> Move:
+        return self.analyse(board, best_move_limit, multipv = 1, game = game)[0]["pv"][0]
+
+    @contextmanager
+    def session(self, key: object) -> Iterator["Session"]:
+        with self.lock:
+            yield Session(self, key)
+
+    def close(self):
+        self.engine.close()
+
+
+class Session:
+    """
+    Consecutive analyses of one game line on one engine.
+    python-chess sends ucinewgame, which clears the hash, whenever the key differs from the engine's
+    previous analysis: plies of one game reuse each other's hash entries, a new game starts from an empty one.
+    """
+
+    def __init__(self, engine: Engine, key: object):
+        self.engine = engine
+        self.key = key
+
+    def analyse(self, board: Board, limit: Limit, multipv: Optional[int] = None) -> List[InfoDict]:
+        return self.engine.analyse(board, limit, multipv, game = self.key)
+
+    def find_best_move(self, board: Board) -> Move:
+        return self.engine.find_best_move(board, game = self.key)
+
+
+class EnginePool:
+    """ Engines sharing the machine's hash budget, a session key always lands on the same engine """
+
+    def __init__(self, engines: List[Engine]):
+        self.engines = engines
+
+    @classmethod
+    def spawn(cls, name, engines: int, threads: int = 1, hash_mb: Optional[int] = None) -> "EnginePool":
+        hash_mb = hash_mb or hash_size_mb(engines)
+        return cls([Engine(name, threads, hash_mb) for _ in range(engines)])
+
+    @classmethod
+    def from_profiles(cls, name, profiles) -> "EnginePool":
+        return cls([Engine.from_profile(name, profile, len(profiles)) for profile in profiles])
+
+    def route(self, key: object) -> Engine:
+        # crc32 for header lines: the same engine across runs, unlike str hashes
+        index = zlib.crc32(key.encode()) if isinstance(key, str) else hash(key)
+        return self.engines[index % len(self.engines)]
+
+    def session(self, key: object):
+        return self.route(key).session(key)
+
     def close(self):
-        self.engine.close()
\ No newline at end of file
+        for engine in self.engines:
+            engine.close()
@@ -0,0 +1,155 @@
+import array
+import mmap
+import pickle
+import sqlite3
+import sys
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from chess import Board, Move, Piece, BB_A1, BB_H1, BB_A8, BB_H8, square_file
+from tags import decode_tags, encode_tags
+
+MAGIC = b"SPTP"
+VERSION = 1
+# longest solution a record holds, unused slots are 0 which is never a legal move (a1a1)
+MAX_MOVES = 32
+# 64 squares as 4 bit pieces, then turn and castling, then the en passant file
+BOARD_BYTES = 34
+NO_EP = 0xFF
+# mate puzzles carry 999999998 or more as cp, they saturate the int16 column
+CP_MIN, CP_MAX = -32768, 32767
+
+HEADER_DTYPE = np.dtype([("magic", "S4"), ("version", "<u2"), ("max_moves", "<u2"), ("count", "<u8")])
+
+Record = Tuple[Board, Sequence[Move], int, Iterable[str]]
+
+
+def encode_board(board: Board) -> bytes:
+    packed = bytearray(BOARD_BYTES)
+    for square, piece in board.piece_map().items():
+        # black pieces have the high bit of their nibble set
+        code = piece.piece_type | (0 if piece.color else 8)
+        packed[square >> 1] |= code << (4 * (square & 1))
+    flags = int(board.turn)
+    for i, corner in enumerate((BB_H1, BB_A1, BB_H8, BB_A8)):
+        if board.castling_rights & corner:
+            flags |= 2 << i
+    packed[32] = flags
+    packed[33] = square_file(board.ep_square) if board.ep_square is not None else NO_EP
+    return bytes(packed)
+
+
+def decode_board(packed: Sequence[int]) -> Board:
+    """ Position of encode_board, move clocks aren't kept """
+    board = Board.empty()
+    for square in range(64):
+        code = packed[square >> 1] >> (4 * (square & 1)) & 0xF
+        if code:
+            board.set_piece_at(square, Piece(code & 7, not code & 8))
+    flags = int(packed[32])
+    board.turn = bool(flags & 1)
+    board.castling_rights = 0
+    for i, corner in enumerate((BB_H1, BB_A1, BB_H8, BB_A8)):
+        if flags & (2 << i):
+            board.castling_rights |= corner
+    ep = int(packed[33])
+    if ep != NO_EP:
+        board.ep_square = ep + (40 if board.turn else 16)
+    return board
+
+
+def unpack_boards(boards: np.ndarray) -> np.ndarray:
+    """ (n, BOARD_BYTES) packed boards to (n, 64) piece codes, a1 first """
+    squares = boards[:, :32]
+    return np.stack((squares & 0xF, squares >> 4), axis = -1).reshape(len(boards), 64)
+
+
+def encode_move(move: Move) -> int:
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code: int) -> Move:
+    return Move(code & 0x3F, code >> 6 & 0x3F, (code >> 12 & 0x7) or None)
+
+
+def write_puzzles(path: str, records: Iterable[Record], max_moves: int = MAX_MOVES) -> int:
+    """
+    Writes (board, solution, cp, tags) records column after column, widest type first so
+    every column starts aligned: tags uint64, moves uint16, cp int16, boards, lengths.
+    """
+    tags = array.array("Q")
+    moves = array.array("H")
+    cps = array.array("h")
+    boards = bytearray()
+    lengths = bytearray()
+    for board, solution, cp, record_tags in records:
+        if len(solution) > max_moves:
+            raise ValueError(f"Solution of {len(solution)} moves, records hold {max_moves}")
+        tags.append(encode_tags(record_tags))
+        codes = [encode_move(move) for move in solution]
+        moves.extend(codes + [0] * (max_moves - len(codes)))
+        cps.append(min(max(cp, CP_MIN), CP_MAX))
+        boards += encode_board(board)
+        lengths.append(len(solution))
+    if sys.byteorder == "big":
+        for column in (tags, moves, cps):
+            column.byteswap()
+    header = np.array([(MAGIC, VERSION, max_moves, len(cps))], dtype = HEADER_DTYPE)
+    with open(path, "wb") as f:
+        for column in (header.tobytes(), tags, moves, cps, boards, lengths):
+            f.write(column)
+    return len(cps)
+
+
+def database_records(db_path: str) -> Iterator[Record]:
+    """ Records of the puzzles table reference/main.py saves, one row at a time """
+    conn = sqlite3.connect(db_path)
+    try:
+        for moves, cp, tags, game in conn.execute("SELECT moves, cp, tags, game FROM puzzles"):
+            yield pickle.loads(game).board(), pickle.loads(moves), cp, filter(None, tags.split(","))
+    finally:
+        conn.close()
+
+
+class PuzzleArchive:
+    """
+    Read only view of a write_puzzles file. The columns are numpy arrays over the mmap,
+    nothing is copied or turned into Python objects until a record is asked for.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.map: Optional[mmap.mmap] = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        header = np.frombuffer(self.map, dtype = HEADER_DTYPE, count = 1).copy()[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} puzzle export")
+        count, self.max_moves = int(header["count"]), int(header["max_moves"])
+        offset = HEADER_DTYPE.itemsize
+
+        def column(dtype, shape) -> np.ndarray:
+            nonlocal offset
+            values = np.frombuffer(self.map, dtype = dtype, count = int(np.prod(shape)), offset = offset).reshape(shape)
+            offset += values.nbytes
+            return values
+
+        self.tags = column("<u8", (count,))
+        self.moves = column("<u2", (count, self.max_moves))
+        self.cp = column("<i2", (count,))
+        self.boards = column("u1", (count, BOARD_BYTES))
+        self.lengths = column("u1", (count,))
+
+    def __len__(self) -> int:
+        return len(self.cp)
+
+    def __getitem__(self, i: int) -> Tuple[Board, List[Move], int, List[str]]:
+        moves = [decode_move(int(code)) for code in self.moves[i, :self.lengths[i]]]
+        return decode_board(self.boards[i]), moves, int(self.cp[i]), decode_tags(int(self.tags[i]))
+
+    def close(self) -> None:
+        # the mmap can't close while arrays still point into it
+        for name in ("tags", "moves", "cp", "boards", "lengths"):
+            self.__dict__.pop(name, None)
+        if self.map:
+            self.map.close()
+            self.map = None
+        self.file.close()
@@ -0,0 +1,176 @@
+import os
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple
+import numpy as np
+from numpy.lib.format import open_memmap
+from chess import Board, COLORS, PIECE_TYPES, BB_FILE_A, BB_FILE_H, BB_FILE_B, BB_FILE_G
+from export import PuzzleArchive, Record, encode_move, unpack_boards
+from tags import encode_tags
+
+# white pawn..king then black pawn..king, the piece codes of export's packed boards
+PIECE_CODES = np.array([piece_type | (0 if color else 8) for color in COLORS for piece_type in PIECE_TYPES], dtype = np.uint8)
+PIECE_PLANES = len(PIECE_CODES)
+ATTACK_PLANES = 2
+# from and to of the first solution moves
+MOVE_PLANES_PER_MOVE = 2
+N_MOVES = 2
+CHUNK_SIZE = 4096
+
+U64 = np.uint64
+NOT_A = U64(~BB_FILE_A & 0xFFFF_FFFF_FFFF_FFFF)
+NOT_H = U64(~BB_FILE_H & 0xFFFF_FFFF_FFFF_FFFF)
+NOT_AB = U64(~(BB_FILE_A | BB_FILE_B) & 0xFFFF_FFFF_FFFF_FFFF)
+NOT_GH = U64(~(BB_FILE_G | BB_FILE_H) & 0xFFFF_FFFF_FFFF_FFFF)
+
+Shift = Callable[[np.ndarray], np.ndarray]
+NORTH: Shift = lambda b: b << U64(8)
+SOUTH: Shift = lambda b: b >> U64(8)
+EAST: Shift = lambda b: (b << U64(1)) & NOT_A
+WEST: Shift = lambda b: (b >> U64(1)) & NOT_H
+NORTH_EAST: Shift = lambda b: (b << U64(9)) & NOT_A
+NORTH_WEST: Shift = lambda b: (b << U64(7)) & NOT_H
+SOUTH_EAST: Shift = lambda b: (b >> U64(7)) & NOT_A
+SOUTH_WEST: Shift = lambda b: (b >> U64(9)) & NOT_H
+ROOK_DIRECTIONS = (NORTH, SOUTH, EAST, WEST)
+BISHOP_DIRECTIONS = (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST)
+
+
+def channels(n_moves: int = N_MOVES) -> int:
+    return PIECE_PLANES + ATTACK_PLANES + MOVE_PLANES_PER_MOVE * n_moves
+
+
+def bitboards_from_boards(boards: Sequence[Board]) -> np.ndarray:
+    """ (n, 12) piece bitboards in PIECE_CODES order """
+    return np.array([
+        [board.pieces_mask(piece_type, color) for color in COLORS for piece_type in PIECE_TYPES]
+        for board in boards
+    ], dtype = np.uint64).reshape(len(boards), PIECE_PLANES)
+
+
+def bitboards_from_codes(codes: np.ndarray) -> np.ndarray:
+    """ (n, 12) piece bitboards of unpack_boards' (n, 64) piece codes """
+    occupied = codes[:, None, :] == PIECE_CODES[None, :, None]
+    return np.packbits(occupied, axis = -1, bitorder = "little").view("<u8").reshape(len(codes), PIECE_PLANES)
+
+
+def _slides(sliders: np.ndarray, empty: np.ndarray, directions: Tuple[Shift, ...]) -> np.ndarray:
+    """ Squares sliders attack up to and including the first blocker, for every position at once """
+    attacks = np.zeros_like(sliders)
+    for shift in directions:
+        flood = sliders
+        gen = sliders
+        for _ in range(6):
+            gen = shift(gen) & empty
+            flood = flood | gen
+        attacks |= shift(flood)
+    return attacks
+
+
+def _knight_attacks(knights: np.ndarray) -> np.ndarray:
+    return (
+        ((knights << U64(17)) & NOT_A) | ((knights << U64(15)) & NOT_H)
+        | ((knights << U64(10)) & NOT_AB) | ((knights << U64(6)) & NOT_GH)
+        | ((knights >> U64(17)) & NOT_H) | ((knights >> U64(15)) & NOT_A)
+        | ((knights >> U64(10)) & NOT_GH) | ((knights >> U64(6)) & NOT_AB)
+    )
+
+
+def _king_attacks(kings: np.ndarray) -> np.ndarray:
+    attacks = np.zeros_like(kings)
+    for shift in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+        attacks |= shift(kings)
+    return attacks
+
+
+def attack_maps(bitboards: np.ndarray) -> np.ndarray:
+    """ (n, 2) squares attacked by white and by black, the union of board.attacks_mask of their pieces """
+    empty = ~np.bitwise_or.reduce(bitboards, axis = 1)
+    maps = np.zeros((len(bitboards), 2), dtype = np.uint64)
+    for side, first in ((0, 0), (1, 6)):
+        pawns, knights, bishops, rooks, queens, kings = (bitboards[:, first + i] for i in range(6))
+        pawn_attacks = (NORTH_EAST(pawns) | NORTH_WEST(pawns)) if side == 0 else (SOUTH_EAST(pawns) | SOUTH_WEST(pawns))
+        maps[:, side] = (
+            pawn_attacks
+            | _knight_attacks(knights)
+            | _slides(bishops | queens, empty, BISHOP_DIRECTIONS)
+            | _slides(rooks | queens, empty, ROOK_DIRECTIONS)
+            | _king_attacks(kings)
+        )
+    return maps
+
+
+def unpack_planes(bitboards: np.ndarray) -> np.ndarray:
+    """ (n, k) bitboards to (n, k, 64) 0/1 planes, a1 first """
+    n, k = bitboards.shape
+    return np.unpackbits(bitboards.astype("<u8").view(np.uint8).reshape(n, k, 8), axis = -1, bitorder = "little")
+
+
+def move_planes(moves: np.ndarray, lengths: np.ndarray, n_moves: int = N_MOVES) -> np.ndarray:
+    """ (n, 2 * n_moves, 64) one-hot from and to squares of export's 16 bit moves, empty past a solution's end """
+    n = len(moves)
+    planes = np.zeros((n, MOVE_PLANES_PER_MOVE * n_moves, 64), dtype = np.uint8)
+    rows = np.arange(n)
+    for i in range(min(n_moves, moves.shape[1])):
+        played = lengths > i
+        codes = moves[played, i]
+        planes[rows[played], 2 * i, codes & 0x3F] = 1
+        planes[rows[played], 2 * i + 1, (codes >> 6) & 0x3F] = 1
+    return planes
+
+
+def features(bitboards: np.ndarray, moves: np.ndarray, lengths: np.ndarray, n_moves: int = N_MOVES) -> np.ndarray:
+    """ (n, channels(n_moves), 8, 8) uint8: piece planes, attack maps, move from/to planes """
+    stacked = np.concatenate((
+        unpack_planes(np.concatenate((bitboards, attack_maps(bitboards)), axis = 1)),
+        move_planes(moves, lengths, n_moves),
+    ), axis = 1)
+    return stacked.reshape(len(bitboards), -1, 8, 8)
+
+
+def archive_chunks(archive: PuzzleArchive, chunk_size: int = CHUNK_SIZE, n_moves: int = N_MOVES) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """ (features, tag masks) of an export archive, straight from its columns """
+    for start in range(0, len(archive), chunk_size):
+        stop = start + chunk_size
+        bitboards = bitboards_from_codes(unpack_boards(archive.boards[start:stop]))
+        yield features(bitboards, archive.moves[start:stop], archive.lengths[start:stop], n_moves), np.array(archive.tags[start:stop])
+
+
+def record_chunks(records: Iterable[Record], chunk_size: int = CHUNK_SIZE, n_moves: int = N_MOVES) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """ archive_chunks for (board, solution, cp, tags) records, e.g. export.database_records """
+    chunk: List[Record] = []
+
+    def flush() -> Tuple[np.ndarray, np.ndarray]:
+        moves = np.zeros((len(chunk), n_moves), dtype = np.uint16)
+        lengths = np.zeros(len(chunk), dtype = np.uint8)
+        for row, (_, solution, _, _) in enumerate(chunk):
+            head = [encode_move(move) for move in solution[:n_moves]]
+            moves[row, :len(head)] = head
+            lengths[row] = len(head)
+        bitboards = bitboards_from_boards([board for board, _, _, _ in chunk])
+        return features(bitboards, moves, lengths, n_moves), np.array([encode_tags(tags) for _, _, _, tags in chunk], dtype = np.uint64)
+
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield flush()
+            chunk = []
+    if chunk:
+        yield flush()
+
+
+def write_shards(chunks: Iterable[Tuple[np.ndarray, np.ndarray]], out_dir: str, prefix: str = "puzzles") -> List[str]:
+    """
+    Writes every chunk to {prefix}_{i}_x.npy and {prefix}_{i}_tags.npy through open_memmap,
+    load them back with np.load(path, mmap_mode="r"). Returns the feature shard paths.
+    """
+    os.makedirs(out_dir, exist_ok = True)
+    paths = []
+    for i, (x, tags) in enumerate(chunks):
+        for suffix, values in (("x", x), ("tags", tags)):
+            path = os.path.join(out_dir, f"{prefix}_{i:05d}_{suffix}.npy")
+            shard = open_memmap(path, mode = "w+", dtype = values.dtype, shape = values.shape)
+            shard[:] = values
+            shard.flush()
+            del shard
+            if suffix == "x":
+                paths.append(path)
+    return paths
@@ -1,17 +1,74 @@
+import heapq
+import itertools
 import logging
-from chess.pgn import Game, read_game
-from io import StringIO
-from chess import Board
-from chess.engine import Cp, Score
+import time
+from chess.pgn import Game
+from chess import Board, Move
+from chess.engine import Cp, Limit, Score
 import math
 import copy
 from puzzle import Puzzle
-from typing import List
+from tablebase import Tablebase
+from opening import OpeningIndex
+from screen import boards_at, candidate_plies, parse_movetext, swings
+from classifier import FULL, SHALLOW, SKIP, PuzzleGate, shallow_limit
+from admission import Admission, Tiers
+from scheduler import Scheduler
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from dataclasses import dataclass
 MISTAKE_THRESHOLD = 0.23
 
+@dataclass
+class Candidate:
+    site: str
+    ply: int
+    board: Board
+    # win chances the side to move gained with the ply
+    swing: float = 0.0
+    budget: str = FULL
+    seconds: float = 0.0
+    # compared as a tuple, highest first: Admission's (tier sum, eval coverage), then the Scheduler's expected yield
+    priority: Tuple[float, ...] = ()
+    # engine limit of the game's admission tier, None is the full search
+    limit: Optional[Limit] = None
+    # engine session of the game, its Site or GameId header
+    key: str = ""
+
+
+def descending(priority: Tuple[float, ...]) -> Tuple[float, ...]:
+    """ Sort key putting the highest priority first """
+    return tuple(-term for term in priority)
+
+
+def game_key(headers: Iterable[str]) -> Optional[str]:
+    """ The GameId or Site header line, unlike the Event line it tells games apart """
+    headers = list(headers)
+    for name in ("[GameId ", "[Site "):
+        for line in headers:
+            if line.startswith(name):
+                return line
+    return None
+
+
+class PgnGame(NamedTuple):
+    site: str
+    movetext: str
+    headers: Tuple[str, ...] = ()
+    # engine session key, the site when empty
+    key: str = ""
+
 class Generator:
-    def __init__(self, engine):
+    def __init__(self, engine, tablebase: Optional[Tablebase] = None, openings: Optional[OpeningIndex] = None,
+                 gate: Optional[PuzzleGate] = None, admission: Optional[Admission] = None,
+                 scheduler: Optional[Scheduler] = None):
         self.engine = engine
+        self.tablebase = tablebase
+        self.openings = openings
+        self.gate = gate
+        self.admission = admission
+        self.scheduler = scheduler
+        # session keys of games without a Site or GameId header
+        self.unnamed = itertools.count()
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(format='%(asctime)s %(levelname)-4s %(message)s', datefmt='%m/%d %H:%M')
         self.logger.setLevel(logging.DEBUG)
@@ -19,31 +76,121 @@ class Generator:
 
     def generate(self, pgn) -> List[Puzzle]:
         puzzles = []
+        for candidate in self.ordered(self.candidates(game) for game in self.games(pgn)):
+            if self.scheduler and self.scheduler.expired():
+                break
+            analysed = self.analyse(candidate)
+            if analysed:
+                puzzles.append(self.tag(*analysed))
+        return puzzles
+
+    def ordered(self, per_game: Iterator[List[Candidate]]) -> Iterator[Candidate]:
+        """ File order, or with admission or a scheduler every candidate of the input highest priority first """
+        if not self.admission and not self.scheduler:
+            for candidates in per_game:
+                yield from candidates
+            return
+        order = itertools.count()
+        heap = [(descending(candidate.priority), next(order), candidate) for candidates in per_game for candidate in candidates]
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)[2]
+
+    def games(self, pgn: str) -> Iterator[PgnGame]:
+        """ (event header, movetext, header lines, session key) of every game with evals that admission lets through """
+        site = ""
+        headers: List[str] = []
         for line in pgn.split('\n'):
             if line.startswith("[Event"):
                 site = line
+                headers = []
+            if line.startswith("["):
+                headers.append(line)
             elif "%eval" in line:
-                game = read_game(StringIO("{}\n{}".format(site, line)))
-                prev_score: Score = Cp(20)
-                for node in game.mainline():
-                    current_eval = node.eval()
-                    if not current_eval:
-                        self.logger.debug("Skipping game without eval: %s", node)
-                        return puzzles
-                    winner = node.board().turn
-                    score = current_eval.pov(winner)
-                    if self.win_chances(score) > self.win_chances(prev_score) + MISTAKE_THRESHOLD:
-                        self.logger.debug("Found tactical opportunity: %s", node.board().fen())
-                        best_move = self.engine.find_best_move(node.board())
-                        
-                        # Create new game from current position
-                        game_snapshot = Game()
-                        game_snapshot.setup(node.board().fen())
-                        # Add the best move as main variation
-                        tactic_node = game_snapshot.add_variation(best_move)
-                        puzzles.append(Puzzle(tactic_node))
-                    prev_score = -score
-        return puzzles
+                if self.admission and not self.admission.admit(Tiers.from_headers(headers)):
+                    self.logger.debug("Game below the admitted tiers: %s", site)
+                    continue
+                key = game_key(headers) or "{} #{}".format(site, next(self.unnamed))
+                yield PgnGame(site, line, tuple(headers), key)
+
+    def candidates(self, game: PgnGame) -> List[Candidate]:
+        site, movetext, headers, key = game
+        sans, cp, mate = parse_movetext(movetext)
+        if len(cp) < len(sans):
+            self.logger.debug("Game without eval from ply %s: %s", len(cp), site)
+        priority: Tuple[float, ...] = ()
+        limit = None
+        if self.admission:
+            if not self.admission.covered(len(sans), len(cp)):
+                self.logger.debug("Too few evals: %s", site)
+                return []
+            tiers = Tiers.from_headers(headers)
+            priority, limit = self.admission.priority(tiers, len(sans), len(cp)), self.admission.limit(tiers)
+        # boards only for the plies worth an engine call, not a game tree for every node
+        gains = swings(cp, mate)
+        try:
+            boards = boards_at(sans, candidate_plies(cp, mate, MISTAKE_THRESHOLD))
+        except ValueError as error:
+            # an illegal or garbled SAN only loses its own game
+            self.logger.warning("Skipping game with a bad move (%s): %s", error, site)
+            return []
+        candidates = [Candidate(site, ply, board, float(gains[ply]), priority = priority, limit = limit, key = key or site)
+                      for ply, board in sorted(boards.items())]
+        if self.scheduler:
+            # last in the tuple: yield only orders candidates of the same tiers and coverage
+            for candidate in candidates:
+                candidate.priority += (self.scheduler.score(candidate.board, candidate.swing, "x" in sans[candidate.ply]),)
+        return candidates
+
+    def analyse(self, candidate: Candidate) -> Optional[Tuple[Candidate, Move]]:
+        self.logger.debug("Found tactical opportunity: %s", candidate.board.fen())
+        if self.gate:
+            candidate.budget = self.gate.decide(candidate.board, candidate.swing)
+        if candidate.budget == SKIP:
+            self.logger.debug("Unlikely puzzle, skipping: %s", candidate.board.fen())
+            return None
+        if self.scheduler and not self.scheduler.admit():
+            self.logger.debug("Out of time, skipping: %s", candidate.board.fen())
+            return None
+        start = time.perf_counter()
+        # candidates of a game share a session key: deeper plies reuse the engine's hash until it switches games
+        with self.engine.session(candidate.key) as session:
+            best_move = self.find_best_move(session, candidate.board, shallow_limit if candidate.budget == SHALLOW else candidate.limit)
+        candidate.seconds = time.perf_counter() - start
+        if self.scheduler:
+            self.scheduler.spent(candidate.seconds)
+        if not best_move:
+            self.logger.debug("Skipping book position: %s", candidate.board.fen())
+            return None
+        return candidate, best_move
+
+    def tag(self, candidate: Candidate, best_move: Move) -> Puzzle:
+        # Create new game from current position
+        game_snapshot = Game()
+        game_snapshot.setup(candidate.board.fen())
+        # Add the best move as main variation
+        tactic_node = game_snapshot.add_variation(best_move)
+        return Puzzle(tactic_node)
+
+    def find_best_move(self, session, board: Board, limit: Optional[Limit] = None) -> Optional[Move]:
+        """ None for known opening theory, which doesn't make a puzzle. limit overrides the engine's full search """
+        # endgames are answered exactly by the tablebase, the engine only sees what it doesn't cover
+        if self.tablebase:
+            result = self.tablebase.probe(board)
+            if result:
+                return result.best.move
+        if self.openings:
+            if self.openings.in_book(board):
+                return None
+            known = self.openings.lookup(board)
+            if known:
+                return known
+        if limit:
+            return session.analyse(board, limit, 1)[0]["pv"][0]
+        move = session.find_best_move(board)
+        if self.openings:
+            self.openings.remember(board, move)
+        return move
 
     def win_chances(self, score: Score) -> float:
         """
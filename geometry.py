@@ -0,0 +1,44 @@
+from typing import List
+import chess
+from chess import BB_KING_ATTACKS, BB_RANKS, BB_SQUARES, SQUARES, BLACK, WHITE, Color, Square, square_distance, square_rank
+
+# 64-entry bitboard tables indexed by square, color first where it matters (BLACK = 0, WHITE = 1)
+
+
+def _rank_mask(rank: int) -> int:
+    return BB_RANKS[rank] if 0 <= rank < 8 else 0
+
+
+def _forward(color: Color, square: Square, ranks: int = 1) -> int:
+    """ The rank that many steps towards the opponent from square """
+    return _rank_mask(square_rank(square) + (ranks if color == WHITE else -ranks))
+
+
+KING_RING: List[int] = [BB_KING_ATTACKS[square] for square in SQUARES]
+# the king's square and its ring
+KING_ZONE: List[int] = [KING_RING[square] | BB_SQUARES[square] for square in SQUARES]
+
+BACK_RANK = [BB_RANKS[7], BB_RANKS[0]]
+# the three ranks on a color's side of the board
+HOME_RANKS = [BB_RANKS[5] | BB_RANKS[6] | BB_RANKS[7], BB_RANKS[0] | BB_RANKS[1] | BB_RANKS[2]]
+EDGES = chess.BB_FILE_A | chess.BB_FILE_H | chess.BB_RANK_1 | chess.BB_RANK_8
+
+# ring squares beside and in front of a king, where its own pawns shelter it
+PAWN_SHIELD: List[List[int]] = [
+    [KING_RING[square] & ~_forward(color, square, -1) for square in SQUARES]
+    for color in (BLACK, WHITE)
+]
+# squares in front of a king on its back rank, empty for kings elsewhere
+BACK_RANK_ESCAPE: List[List[int]] = [
+    [KING_RING[square] & _forward(color, square) if BB_SQUARES[square] & BACK_RANK[color] else 0 for square in SQUARES]
+    for color in (BLACK, WHITE)
+]
+
+# king moves between two squares
+DISTANCE: List[List[int]] = [[square_distance(a, b) for b in SQUARES] for a in SQUARES]
+CORNERS = [chess.A1, chess.H1, chess.A8, chess.H8]
+CORNER_DISTANCE: List[int] = [min(DISTANCE[square][corner] for corner in CORNERS) for square in SQUARES]
+
+# squares strictly between two squares on a line, and the whole line through them, 0 when not aligned
+BETWEEN: List[List[int]] = [[chess.between(a, b) for b in SQUARES] for a in SQUARES]
+RAY: List[List[int]] = [[chess.ray(a, b) for b in SQUARES] for a in SQUARES]
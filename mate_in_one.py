@@ -0,0 +1,69 @@
+from typing import List
+from chess import Board, Move, Square, PieceType, BB_KING_ATTACKS, BB_KNIGHT_ATTACKS, BB_PAWN_ATTACKS, BB_SQUARES, scan_forward
+from chess import BB_DIAG_ATTACKS, BB_DIAG_MASKS, BB_FILE_ATTACKS, BB_FILE_MASKS, BB_RANK_ATTACKS, BB_RANK_MASKS
+from chess import PAWN, KNIGHT, BISHOP, ROOK, QUEEN
+
+
+def _attacks(piece_type: PieceType, color: bool, square: Square, occupied: int) -> int:
+    if piece_type == PAWN:
+        return BB_PAWN_ATTACKS[color][square]
+    if piece_type == KNIGHT:
+        return BB_KNIGHT_ATTACKS[square]
+    attacks = 0
+    if piece_type in (BISHOP, QUEEN):
+        attacks |= BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied]
+    if piece_type in (ROOK, QUEEN):
+        attacks |= BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied] | BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied]
+    return attacks
+
+
+def gives_check(board: Board, move: Move, king: Square) -> bool:
+    """ board.gives_check without pushing the move: the moved piece's attacks, or a slider it uncovers """
+    if board.is_castling(move) or board.is_en_passant(move):
+        return board.gives_check(move)
+    piece_type = move.promotion or board.piece_type_at(move.from_square)
+    assert piece_type
+    occupied = (board.occupied & ~BB_SQUARES[move.from_square]) | BB_SQUARES[move.to_square]
+    if _attacks(piece_type, board.turn, move.to_square, occupied) & BB_SQUARES[king]:
+        return True
+    return bool(board.attackers_mask(board.turn, king, occupied) & ~BB_SQUARES[move.from_square])
+
+
+def _king_escapes(board: Board) -> bool:
+    """ The checked side to move has a king move to a square nothing attacks, looked up on bitboards """
+    color = board.turn
+    king = board.king(color)
+    if king is None:
+        return False
+    # the king doesn't block the checker's ray to the squares behind it
+    occupied = board.occupied & ~BB_SQUARES[king]
+    for square in scan_forward(BB_KING_ATTACKS[king] & ~board.occupied_co[color]):
+        if not board.attackers_mask(not color, square, occupied):
+            return True
+    return False
+
+
+def mating_moves(board: Board) -> List[Move]:
+    """
+    The side to move's mates in one. Only the moves gives_check finds are played, a free square next to
+    the king rules a mate out before the defender's moves are generated, and the board is never copied.
+    """
+    mates: List[Move] = []
+    king = board.king(not board.turn)
+    if king is None:
+        return mates
+    for move in board.generate_legal_moves():
+        if not gives_check(board, move, king):
+            continue
+        board.push(move)
+        try:
+            if not _king_escapes(board) and not any(board.generate_legal_moves()):
+                mates.append(move)
+        finally:
+            board.pop()
+    return mates
+
+
+def non_mating_moves(board: Board) -> List[Move]:
+    mates = set(mating_moves(board))
+    return [move for move in board.generate_legal_moves() if move not in mates]
@@ -0,0 +1,130 @@
+from typing import Dict, Optional
+import chess
+from chess import Board, Color, Move, SquareSet, BB_CORNERS, BB_SQUARES, BISHOP, KNIGHT, QUEEN, ROOK
+from chess import square, square_file, square_rank
+from geometry import BACK_RANK, BACK_RANK_ESCAPE, DISTANCE, EDGES, KING_RING, KING_ZONE
+from profiler import profiled
+
+
+class MatePosition:
+    """
+    The final position of a mating line analysed once: mated king, its ring, checkers, defenders
+    and the mating side's attackers per square, computed on first use and shared by every pattern.
+    """
+
+    def __init__(self, board: Board, move: Move, pov: Color):
+        self.board = board
+        self.move = move
+        self.pov = pov
+        king = board.king(not pov)
+        assert king is not None
+        self.king = king
+        self.ring = KING_RING[king]
+        self.checkers = board.checkers_mask()
+        self.defenders = board.occupied_co[not pov]
+        self.moved = board.piece_type_at(move.to_square)
+        self._attackers: Dict[int, int] = {}
+
+    def attackers(self, square: int) -> int:
+        if square not in self._attackers:
+            self._attackers[square] = self.board.attackers_mask(self.pov, square)
+        return self._attackers[square]
+
+    def next_to_king(self, square: int) -> bool:
+        return bool(BB_SQUARES[square] & self.ring)
+
+    def smothered(self) -> bool:
+        if not self.checkers & self.board.knights:
+            return False
+        return not self.ring & ~self.defenders
+
+    def back_rank(self) -> bool:
+        back_rank = BACK_RANK[not self.pov]
+        if not BB_SQUARES[self.king] & back_rank or not self.board.is_checkmate():
+            return False
+        front = BACK_RANK_ESCAPE[not self.pov][self.king]
+        if front & ~self.defenders or any(self.attackers(s) for s in SquareSet(front)):
+            return False
+        return bool(self.checkers & back_rank)
+
+    def anastasia(self) -> bool:
+        file = square_file(self.king)
+        if file not in (0, 7) or square_rank(self.king) in (0, 7):
+            return False
+        if square_file(self.move.to_square) != file or self.moved not in (QUEEN, ROOK):
+            return False
+        inwards = 1 if file == 0 else -1
+        knight = self.board.piece_at(self.king + 3 * inwards)
+        return (
+            bool(BB_SQUARES[self.king + inwards] & self.defenders)
+            and knight is not None
+            and knight.color == self.pov
+            and knight.piece_type == KNIGHT
+        )
+
+    def hook(self) -> bool:
+        if self.moved != ROOK or not self.next_to_king(self.move.to_square):
+            return False
+        knights = self.attackers(self.move.to_square) & self.board.knights & self.ring
+        return any(self.attackers(s) & self.board.pawns for s in SquareSet(knights))
+
+    def arabian(self) -> bool:
+        if not BB_SQUARES[self.king] & BB_CORNERS or self.moved != ROOK or not self.next_to_king(self.move.to_square):
+            return False
+        # two files and two ranks away from the cornered king
+        file, rank = square_file(self.king), square_rank(self.king)
+        knight_square = square(2 if file == 0 else 5, 2 if rank == 0 else 5)
+        return bool(self.attackers(self.move.to_square) & self.board.knights & BB_SQUARES[knight_square])
+
+    def boden_or_double_bishop(self) -> Optional[str]:
+        bishops = self.board.pieces_mask(BISHOP, self.pov)
+        if chess.popcount(bishops) < 2:
+            return None
+        for s in SquareSet(KING_ZONE[self.king]):
+            if self.attackers(s) & ~self.board.bishops:
+                return None
+        first, second = list(SquareSet(bishops))[:2]
+        file = square_file(self.king)
+        if (square_file(first) < file) == (square_file(second) > file):
+            return "bodenMate"
+        return "doubleBishopMate"
+
+    def dovetail(self) -> bool:
+        if BB_SQUARES[self.king] & EDGES:
+            return False
+        queen = self.move.to_square
+        if (
+            self.moved != QUEEN
+            or square_file(queen) == square_file(self.king)
+            or square_rank(queen) == square_rank(self.king)
+            or DISTANCE[queen][self.king] > 1
+        ):
+            return False
+        for s in SquareSet(self.ring & ~BB_SQUARES[queen]):
+            attackers = self.attackers(s)
+            if attackers == BB_SQUARES[queen]:
+                if self.board.piece_at(s):
+                    return False
+            elif attackers:
+                return False
+        return True
+
+    def classify(self) -> Optional[str]:
+        """ The first pattern that matches, in the precedence tag_puzzle has always used """
+        if self.smothered():
+            return "smotheredMate"
+        if self.back_rank():
+            return "backRankMate"
+        if self.anastasia():
+            return "anastasiaMate"
+        if self.hook():
+            return "hookMate"
+        if self.arabian():
+            return "arabianMate"
+        return self.boden_or_double_bishop() or ("dovetailMate" if self.dovetail() else None)
+
+
+@profiled
+def mate_pattern(board: Board, move: Move, pov: Color) -> Optional[str]:
+    """ Mate tag of the position after move, pov the mating side """
+    return MatePosition(board, move, pov).classify()
@@ -0,0 +1,113 @@
+import multiprocessing
+from typing import Any, Optional
+from weakref import WeakKeyDictionary
+from chess.engine import InfoDict, Limit
+
+# stockfish overshoots or stops a few ms short of a movetime, count those as time limited too
+TIME_SLACK = 0.05
+
+
+class RingBuffer:
+    """
+    Fixed capacity buffer of floats in shared memory, usable from threads and forked processes.
+    append() and mean() are constant time, the running sum is updated as old values are overwritten.
+    """
+
+    def __init__(self, capacity: int = 10_000, lock = None):
+        self.capacity = capacity
+        self.lock = lock or multiprocessing.RLock()
+        self.values = multiprocessing.RawArray('d', capacity)
+        self.appended = multiprocessing.RawValue('q', 0)
+        self.total = multiprocessing.RawValue('d', 0.0)
+
+    def append(self, value: float) -> None:
+        with self.lock:
+            index = self.appended.value % self.capacity
+            if self.appended.value >= self.capacity:
+                self.total.value -= self.values[index]
+            self.values[index] = value
+            self.total.value += value
+            self.appended.value += 1
+
+    def __len__(self) -> int:
+        return min(self.appended.value, self.capacity)
+
+    def mean(self) -> float:
+        with self.lock:
+            size = len(self)
+            return self.total.value / size if size else 0.0
+
+
+class Counter:
+    def __init__(self, lock = None):
+        self.lock = lock or multiprocessing.RLock()
+        self.count = multiprocessing.RawValue('q', 0)
+
+    def increment(self) -> None:
+        with self.lock:
+            self.count.value += 1
+
+    @property
+    def value(self) -> int:
+        return self.count.value
+
+
+class EngineMetrics:
+    """
+    Per engine throughput: nodes/sec, time per analysis, depth reached, hash usage,
+    and how many analyses were cut short by the time or the node limit.
+    Create it before forking worker processes to share it with them.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        lock = multiprocessing.RLock()
+        self.knps = RingBuffer(capacity, lock)
+        self.seconds = RingBuffer(capacity, lock)
+        self.depth = RingBuffer(capacity, lock)
+        self.hashfull = RingBuffer(capacity, lock)
+        self.analyses = Counter(lock)
+        self.time_limited = Counter(lock)
+        self.node_limited = Counter(lock)
+
+    def observe(self, info: InfoDict, limit: Optional[Limit] = None) -> None:
+        """ Records the main line info of one finished analysis run with the given limit """
+        self.analyses.increment()
+        if "nps" in info:
+            self.knps.append(info["nps"] / 1000)
+        if "time" in info:
+            self.seconds.append(info["time"])
+        if "depth" in info:
+            self.depth.append(info["depth"])
+        if "hashfull" in info:
+            self.hashfull.append(info["hashfull"] / 10) # permille to percent
+        if not limit:
+            return
+        if limit.nodes is not None and info.get("nodes", 0) >= limit.nodes:
+            self.node_limited.increment()
+        elif limit.time is not None and info.get("time", 0) >= limit.time - TIME_SLACK:
+            self.time_limited.increment()
+
+    def avg_knps(self) -> int:
+        return round(self.knps.mean())
+
+    def summary(self) -> dict:
+        return {
+            "analyses": self.analyses.value,
+            "avg_knps": self.avg_knps(),
+            "avg_seconds": self.seconds.mean(),
+            "avg_depth": self.depth.mean(),
+            "avg_hashfull_percent": self.hashfull.mean(),
+            "time_limited": self.time_limited.value,
+            "node_limited": self.node_limited.value,
+        }
+
+
+# one EngineMetrics per engine, so engines of different sizes don't average into each other
+metrics: "WeakKeyDictionary[Any, EngineMetrics]" = WeakKeyDictionary()
+
+
+def engine_metrics(engine: Any) -> EngineMetrics:
+    """ The engine's metrics, created on first use: call it before forking to share them with workers """
+    if engine not in metrics:
+        metrics[engine] = EngineMetrics()
+    return metrics[engine]
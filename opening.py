@@ -0,0 +1,51 @@
+import json
+import os
+from typing import Dict, Optional
+import chess.polyglot
+from chess import Board, Move
+
+# only the first moves of a game repeat across thousands of games, deeper positions aren't worth storing
+MAX_PLY = 24
+
+
+class OpeningIndex:
+    """
+    Early positions keyed by Zobrist hash, the same key Polyglot books use.
+    Book positions are known theory and skipped, previously analysed positions are answered from the store.
+    """
+
+    def __init__(self, book_path: Optional[str] = None, store_path: Optional[str] = None, max_ply: int = MAX_PLY):
+        self.book = chess.polyglot.open_reader(book_path) if book_path and os.path.exists(book_path) else None
+        self.store_path = store_path
+        self.max_ply = max_ply
+        self.analysed: Dict[int, str] = {}
+        if store_path and os.path.exists(store_path):
+            with open(store_path, encoding="utf-8") as f:
+                self.analysed = {int(key, 16): uci for key, uci in json.load(f).items()}
+
+    def covers(self, board: Board) -> bool:
+        return board.ply() <= self.max_ply
+
+    def in_book(self, board: Board) -> bool:
+        return self.book is not None and self.covers(board) and self.book.get(board) is not None
+
+    def lookup(self, board: Board) -> Optional[Move]:
+        if not self.covers(board):
+            return None
+        uci = self.analysed.get(chess.polyglot.zobrist_hash(board))
+        return Move.from_uci(uci) if uci else None
+
+    def remember(self, board: Board, move: Move) -> None:
+        if self.covers(board):
+            self.analysed[chess.polyglot.zobrist_hash(board)] = move.uci()
+
+    def save(self) -> None:
+        if not self.store_path:
+            return
+        with open(self.store_path, "w", encoding="utf-8") as f:
+            json.dump({format(key, "016x"): uci for key, uci in self.analysed.items()}, f)
+
+    def close(self) -> None:
+        self.save()
+        if self.book:
+            self.book.close()
@@ -0,0 +1,165 @@
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+GAME_START = b"[Event "
+HEADER_REGEX = re.compile(rb'^\[(\w+) "([^"]*)"\]', re.M)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    site TEXT,
+    white TEXT,
+    black TEXT,
+    white_elo INTEGER,
+    black_elo INTEGER,
+    date TEXT,
+    time_control TEXT,
+    offset INTEGER,
+    length INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_white ON games (white);
+CREATE INDEX IF NOT EXISTS games_black ON games (black);
+CREATE INDEX IF NOT EXISTS games_date ON games (date);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+"""
+
+
+def _elo(value: Optional[bytes]) -> Optional[int]:
+    return int(value) if value and value.isdigit() else None
+
+
+class PgnArchive:
+    """
+    A PGN file read through mmap with a sqlite sidecar index of GameId -> byte range and headers.
+    Games appended to the file since the last run are indexed on open, the rest isn't rescanned.
+    A file rewritten in place or replaced, like a newest-first export, is indexed from scratch.
+    """
+
+    def __init__(self, path: str, index_path: Optional[str] = None):
+        self.path = path
+        self.db = sqlite3.connect(index_path or path + ".idx")
+        self.db.executescript(SCHEMA)
+        self.file = open(path, "rb")
+        self.map: Optional[mmap.mmap] = None
+        self.refresh()
+
+    def refresh(self) -> int:
+        """ Indexes games added since the last call, returns how many """
+        size = os.fstat(self.file.fileno()).st_size
+        if self.map:
+            self.map.close()
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ) if size else None
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'indexed_bytes'").fetchone()
+        indexed = row[0] if row else 0
+        known = self.db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        fingerprint = self.fingerprint()
+        if size < indexed or (indexed and (not known or known[0] != fingerprint)):
+            # file was rewritten, start over
+            self.db.execute("DELETE FROM games")
+            indexed = 0
+        if not self.map or size == indexed:
+            return 0
+        # the last indexed game may have been cut short by a download still writing to the file
+        last = self.db.execute("SELECT max(offset) FROM games").fetchone()[0] if indexed else None
+        rows = list(self._scan(last or 0, size))
+        self.db.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('indexed_bytes', ?)", (size,))
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        self.db.commit()
+        return len(rows)
+
+    def fingerprint(self) -> str:
+        """
+        Inode and a hash of the first game's headers: appending keeps both, a rewrite changes
+        the first game of a newest-first export, a replaced file gets a new inode
+        """
+        inode = os.fstat(self.file.fileno()).st_ino
+        if not self.map:
+            return str(inode)
+        header_end = self.map.find(b"\n\n")
+        first = self.map[:header_end if header_end != -1 else len(self.map)]
+        return "{}:{}".format(inode, hashlib.sha1(first).hexdigest())
+
+    def _next_game(self, start: int, end: int) -> int:
+        assert self.map
+        if start == 0 and self.map[:len(GAME_START)] == GAME_START:
+            return 0
+        found = self.map.find(b"\n" + GAME_START, max(start - 1, 0), end)
+        return found + 1 if found != -1 else -1
+
+    def _scan(self, start: int, end: int) -> Iterator[Tuple]:
+        assert self.map
+        offset = self._next_game(start, end)
+        while offset != -1:
+            following = self._next_game(offset + 1, end)
+            stop = following if following != -1 else end
+            header_end = self.map.find(b"\n\n", offset, stop)
+            headers = dict(HEADER_REGEX.findall(self.map[offset:header_end if header_end != -1 else stop]))
+            site = headers.get(b"Site", b"").decode()
+            game_id = headers.get(b"GameId", b"").decode() or site.rsplit("/", 1)[-1] or str(offset)
+            yield (
+                game_id,
+                site,
+                headers.get(b"White", b"").decode(),
+                headers.get(b"Black", b"").decode(),
+                _elo(headers.get(b"WhiteElo")),
+                _elo(headers.get(b"BlackElo")),
+                (headers.get(b"UTCDate") or headers.get(b"Date") or b"").decode(),
+                headers.get(b"TimeControl", b"").decode(),
+                offset,
+                stop - offset,
+            )
+            offset = following
+
+    def read(self, offset: int, length: int) -> str:
+        assert self.map
+        return self.map[offset:offset + length].decode("utf-8").strip()
+
+    def game(self, game_id: str) -> Optional[str]:
+        row = self.db.execute("SELECT offset, length FROM games WHERE game_id = ?", (game_id,)).fetchone()
+        return self.read(*row) if row else None
+
+    def select(self, user: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+               min_elo: Optional[int] = None, max_elo: Optional[int] = None,
+               shard: Optional[Tuple[int, int]] = None) -> Iterator[str]:
+        """
+        Game texts in file order. Dates compare as the PGN's YYYY.MM.DD strings,
+        elo bounds apply to both players, shard=(i, n) keeps the games whose game id hashes to i modulo n,
+        so a game stays in its shard when the file is reindexed or grows.
+        """
+        clauses: List[str] = []
+        params: List[object] = []
+        if user:
+            clauses.append("(white = ? OR black = ?)")
+            params += [user, user]
+        if since:
+            clauses.append("date >= ?")
+            params.append(since)
+        if until:
+            clauses.append("date <= ?")
+            params.append(until)
+        if min_elo is not None:
+            clauses.append("min(white_elo, black_elo) >= ?")
+            params.append(min_elo)
+        if max_elo is not None:
+            clauses.append("max(white_elo, black_elo) <= ?")
+            params.append(max_elo)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        for game_id, offset, length in self.db.execute(f"SELECT game_id, offset, length FROM games{where} ORDER BY offset", params).fetchall():
+            if shard and zlib.crc32(game_id.encode()) % shard[1] != shard[0]:
+                continue
+            yield self.read(offset, length)
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT count(*) FROM games").fetchone()[0]
+
+    def close(self) -> None:
+        if self.map:
+            self.map.close()
+        self.file.close()
+        self.db.close()
@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+from chess import Board, Color, PieceType, Square, SquareSet, BB_SQUARES, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, scan_forward
+from chess import BB_DIAG_ATTACKS, BB_DIAG_MASKS, BB_FILE_ATTACKS, BB_FILE_MASKS, BB_RANK_ATTACKS, BB_RANK_MASKS
+from geometry import BETWEEN, RAY
+from see import VALUES, MEMO_SIZE, Position, position
+
+
+@dataclass(frozen = True)
+class Line:
+    """ A slider looking through the first opponent piece on its ray, front, at a second one behind it """
+    slider: Square
+    front: Square
+    behind: Square
+    front_type: PieceType
+    behind_type: PieceType
+
+    @property
+    def absolute(self) -> bool:
+        return self.behind_type == KING
+
+    @property
+    def is_pin(self) -> bool:
+        """ The front piece can't move off the line without giving up something worth more """
+        return self.absolute or VALUES[self.behind_type] > VALUES[self.front_type]
+
+    @property
+    def is_skewer(self) -> bool:
+        return self.front_type == KING or VALUES[self.front_type] > VALUES[self.behind_type]
+
+    @property
+    def ray(self) -> SquareSet:
+        """ The whole line, the squares a pinned front piece stays on, like board.pin """
+        return SquareSet(RAY[self.behind][self.front])
+
+
+def _piece_type(pos: Position, square: Square) -> PieceType:
+    mask = BB_SQUARES[square]
+    for piece_type, pieces in zip((PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING), pos):
+        if pieces & mask:
+            return piece_type
+    raise ValueError(f"no piece on {square}")
+
+
+def _slides(square: Square, piece_type: PieceType, occupied: int) -> int:
+    attacks = 0
+    if piece_type != ROOK:
+        attacks |= BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied]
+    if piece_type != BISHOP:
+        attacks |= BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied] | BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied]
+    return attacks
+
+
+@lru_cache(maxsize = MEMO_SIZE)
+def _lines(pos: Position, color: Color) -> Tuple[Line, ...]:
+    _, _, bishops, rooks, queens, _, black, white = pos
+    ours, theirs = (white, black) if color else (black, white)
+    occupied = white | black
+    lines = []
+    for slider in scan_forward(ours & (bishops | rooks | queens)):
+        slider_type = _piece_type(pos, slider)
+        for front in scan_forward(_slides(slider, slider_type, occupied) & theirs):
+            # what the slider would reach with front gone, beyond front on the same ray
+            beyond = _slides(slider, slider_type, occupied & ~BB_SQUARES[front]) & RAY[slider][front] & ~BETWEEN[slider][front]
+            for behind in scan_forward(beyond & theirs & ~BB_SQUARES[front]):
+                if BETWEEN[slider][behind] & BB_SQUARES[front]:
+                    lines.append(Line(slider, front, behind, _piece_type(pos, front), _piece_type(pos, behind)))
+    return tuple(lines)
+
+
+def lines(board: Board, color: Color) -> Tuple[Line, ...]:
+    """ Every line color's bishops, rooks and queens have through an opponent piece, computed once per position """
+    return _lines(position(board), color)
+
+
+def pins(board: Board, color: Color) -> Dict[Square, Line]:
+    """
+    Absolute and relative pins of color's pieces by the opponent's sliders, by pinned square.
+    A piece pinned twice keeps the pin to its king, otherwise the one to the most valuable piece.
+    """
+    pinned: Dict[Square, Line] = {}
+    for line in lines(board, not color):
+        if not line.is_pin:
+            continue
+        known = pinned.get(line.front)
+        if known is None or VALUES[line.behind_type] > VALUES[known.behind_type]:
+            pinned[line.front] = line
+    return pinned
+
+
+def skewers(board: Board, color: Color) -> Tuple[Line, ...]:
+    """ Lines of color's sliders through a more valuable opponent piece to a cheaper one """
+    return tuple(line for line in lines(board, color) if line.is_skewer)
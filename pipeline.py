@@ -0,0 +1,138 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# end of input marker, one per downstream worker
+STOP = object()
+
+
+class Stage:
+    """
+    One step of the pipeline: workers threads take items from a bounded inbox and
+    put whatever fn yields into the next stage's inbox, blocking when it is full.
+    With priority the inbox hands out its highest priority item first instead of the oldest.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Optional[Iterable[Any]]], workers: int = 1, maxsize: int = 64,
+                 priority: Optional[Callable[[Any], Tuple[float, ...]]] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.priority = priority
+        self.inbox: queue.Queue = queue.PriorityQueue(maxsize) if priority else queue.Queue(maxsize)
+        self.order = itertools.count()
+        self.received = 0
+        self.emitted = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def put(self, item: Any) -> None:
+        if self.priority is None:
+            self.inbox.put(item)
+            return
+        # highest priority tuple first, ties in arrival order, STOP after every item
+        key = (1,) if item is STOP else (0, tuple(-term for term in self.priority(item)))
+        self.inbox.put((key, next(self.order), item))
+
+    def get(self) -> Any:
+        item = self.inbox.get()
+        return item if self.priority is None else item[2]
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.inbox.qsize(),
+                "queue_size": self.inbox.maxsize,
+                "received": self.received,
+                "emitted": self.emitted,
+                "failed": self.failed,
+                "per_second": self.received / elapsed if elapsed else 0.0,
+                # share of the workers' wall time spent inside fn, 1.0 is a saturated stage
+                "utilization": self.busy / (elapsed * self.workers) if elapsed else 0.0,
+            }
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def _work(self, index: int, remaining: List[int]) -> None:
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.get()
+            if item is STOP:
+                break
+            start = time.perf_counter()
+            emitted = 0
+            try:
+                for out in stage.fn(item) or ():
+                    emitted += 1
+                    if downstream:
+                        downstream.put(out)
+            except Exception:
+                logger.exception("Stage %s failed on %r", stage.name, item)
+                with stage.lock:
+                    stage.failed += 1
+            with stage.lock:
+                stage.received += 1
+                stage.emitted += emitted
+                stage.busy += time.perf_counter() - start
+        with stage.lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and downstream:
+            for _ in range(downstream.workers):
+                downstream.put(STOP)
+
+    def run(self, items: Iterable[Any]) -> None:
+        """ Feeds items to the first stage and returns once every stage has drained """
+        self.started = time.perf_counter()
+        remaining = [stage.workers for stage in self.stages]
+        threads = [
+            threading.Thread(target = self._work, args = (i, remaining), name = f"{stage.name}-{n}", daemon = True)
+            for i, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        first = self.stages[0]
+        for item in items:
+            first.put(item)
+        for _ in range(first.workers):
+            first.put(STOP)
+        for thread in threads:
+            thread.join()
+        self.finished = time.perf_counter()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """ Per stage throughput and queue depth, safe to call from another thread while running """
+        if self.started is None:
+            return {}
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
+
+
+def puzzle_pipeline(generator, store: Callable[[Any], None], analysers: int = 1, maxsize: int = 64) -> Pipeline:
+    """
+    parse -> screen -> analyse -> tag -> store around a generator.Generator.
+    Give analyse one worker per engine of an engine.EnginePool so the engine stage stays saturated, the others are cheap.
+    Games spread over the pool by their Site or GameId session key.
+    """
+    return Pipeline([
+        Stage("parse", generator.games, 1, maxsize),
+        Stage("screen", generator.candidates, 1, maxsize),
+        Stage("analyse", lambda candidate: filter(None, [generator.analyse(candidate)]), analysers, maxsize,
+              lambda candidate: candidate.priority),
+        Stage("tag", lambda analysed: [generator.tag(*analysed)], 1, maxsize),
+        Stage("store", store, 1, maxsize),
+    ])
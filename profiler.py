@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, Optional, TypeVar
+
+# upper bounds in seconds, detectors live in the sub-millisecond range, engine calls in the seconds range
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class Timing:
+    def __init__(self, samples: int = 10_000):
+        self.calls = 0
+        self.hits = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        # recent samples only, p99 is computed over this window
+        self.samples: deque = deque(maxlen=samples)
+
+    def add(self, elapsed: float, hit: bool, error: bool = False) -> None:
+        self.calls += 1
+        self.hits += hit
+        self.errors += error
+        self.total += elapsed
+        self.buckets[bisect_left(BUCKETS, elapsed)] += 1
+        self.samples.append(elapsed)
+
+    def p99(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def hit_rate(self) -> float:
+        return self.hits / self.calls if self.calls else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "errors": self.errors,
+            "hit_rate": self.hit_rate(),
+            "total_seconds": self.total,
+            "p99_seconds": self.p99(),
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.buckets)),
+        }
+
+
+class Profiler:
+    """
+    Opt-in call counts, cumulative/p99 time and hit rate per detector or engine call.
+    A call is a hit when the wrapped function returns a truthy value, an error when it raises.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.timings: Dict[str, Timing] = {}
+        self.lock = threading.Lock()
+
+    def record(self, name: str, elapsed: float, hit: bool, error: bool = False) -> None:
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.add(elapsed, hit, error)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timings = {}
+
+    def to_dict(self) -> Dict[str, dict]:
+        with self.lock:
+            return {name: timing.as_dict() for name, timing in sorted(self.timings.items())}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str = "spot_tactics") -> str:
+        lines = [
+            f"# TYPE {prefix}_calls_total counter",
+            f"# TYPE {prefix}_hits_total counter",
+            f"# TYPE {prefix}_errors_total counter",
+            f"# TYPE {prefix}_seconds histogram",
+            f"# TYPE {prefix}_p99_seconds gauge",
+        ]
+        for name, stats in self.to_dict().items():
+            label = f'name="{name}"'
+            lines.append(f"{prefix}_calls_total{{{label}}} {stats['calls']}")
+            lines.append(f"{prefix}_hits_total{{{label}}} {stats['hits']}")
+            lines.append(f"{prefix}_errors_total{{{label}}} {stats['errors']}")
+            cumulative = 0
+            for le, count in stats["buckets"].items():
+                cumulative += count
+                lines.append(f'{prefix}_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{prefix}_seconds_sum{{{label}}} {stats['total_seconds']}")
+            lines.append(f"{prefix}_seconds_count{{{label}}} {stats['calls']}")
+            lines.append(f"{prefix}_p99_seconds{{{label}}} {stats['p99_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """ Writes Prometheus text if the path ends with .prom, JSON otherwise """
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+
+profiler = Profiler(enabled=bool(os.getenv("SPOT_TACTICS_PROFILE")))
+
+F = TypeVar("F", bound=Callable)
+def profiled(fn: F, name: Optional[str] = None) -> F:
+    """ Times fn under its own name with the global profiler, a plain call when profiling is off """
+    key = name or fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        result = None
+        error = True
+        try:
+            result = fn(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            # failed and timed out calls keep their time, counted as errors
+            profiler.record(key, time.perf_counter() - start, bool(result), error)
+
+    return wrapper  # type: ignore
@@ -0,0 +1,117 @@
+import glob
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import List, Mapping, Optional, Tuple
+import yaml
+from chess import Board
+from chess.engine import Limit
+from engine import EnginePool, hash_size_mb
+
+# test.py: don't use more than 6 threads! it fails at finding mates
+MAX_THREADS = 6
+
+
+@dataclass
+class EngineProfile:
+    threads: int = MAX_THREADS
+    hash_mb: Optional[int] = None
+    multipv: int = 1
+    syzygy_path: Optional[str] = None
+    # cpu set the engine process is pinned to, None leaves scheduling to the OS
+    cpus: Optional[List[int]] = None
+
+
+ENV_KEYS = {
+    "SPOT_TACTICS_THREADS": ("threads", int),
+    "SPOT_TACTICS_HASH": ("hash_mb", int),
+    "SPOT_TACTICS_MULTIPV": ("multipv", int),
+    "SPOT_TACTICS_SYZYGY": ("syzygy_path", str),
+}
+
+def load_profile(path: Optional[str] = None, env: Mapping[str, str] = os.environ) -> EngineProfile:
+    """ Reads a YAML profile (keys are the EngineProfile fields), SPOT_TACTICS_* environment variables win """
+    settings = {}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            settings = yaml.safe_load(f) or {}
+    for key, (field, cast) in ENV_KEYS.items():
+        if key in env:
+            settings[field] = cast(env[key])
+    return EngineProfile(**settings)
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """ "0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11] """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def numa_nodes() -> List[List[int]]:
+    """ Usable cpus grouped by NUMA node, a single group when the topology is unknown """
+    usable = os.sched_getaffinity(0)
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node*/cpulist"), key = lambda p: int(re.findall(r"node(\d+)", p)[-1])):
+        with open(path) as f:
+            cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in usable]
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [sorted(usable)]
+
+
+def plan_profiles(engines: int, nodes: Optional[List[List[int]]] = None, memory_mb: Optional[int] = None,
+                  fraction: float = 0.5, pin: bool = False, syzygy_path: Optional[str] = None) -> List[EngineProfile]:
+    """
+    Splits cores and hash memory across a pool of engines.
+    Engines are dealt round robin over NUMA nodes and only get cores of their own node,
+    so threads and hash of one engine never straddle a node.
+    """
+    nodes = nodes or numa_nodes()
+    per_node: List[List[int]] = [[] for _ in nodes]
+    for i in range(engines):
+        per_node[i % len(nodes)].append(i)
+    hash_mb = hash_size_mb(engines, fraction, memory_mb)
+    profiles: List[Optional[EngineProfile]] = [None] * engines
+    for cpus, members in zip(nodes, per_node):
+        for j, i in enumerate(members):
+            share = cpus[j * len(cpus) // len(members):(j + 1) * len(cpus) // len(members)] or cpus[j % len(cpus):][:1]
+            profiles[i] = EngineProfile(
+                threads = min(MAX_THREADS, len(share)),
+                hash_mb = hash_mb,
+                syzygy_path = syzygy_path,
+                cpus = share if pin else None,
+            )
+    return [p for p in profiles if p]
+
+
+def candidate_splits(cores: Optional[int] = None) -> List[Tuple[int, int]]:
+    """ (engines, threads per engine) pairs using the whole machine, from many small engines to few large ones """
+    cores = cores or len(os.sched_getaffinity(0))
+    return [(cores // threads, threads) for threads in range(1, min(MAX_THREADS, cores) + 1) if cores // threads]
+
+
+def benchmark_split(name: str, profiles: List[EngineProfile], boards: List[Board], limit: Limit) -> float:
+    """ Positions analysed per second by a pool built from profiles, boards are spread over its engines """
+    pool = EnginePool.from_profiles(name, profiles)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(pool.engines)) as executor:
+            def run(i: int) -> None:
+                with pool.session(i) as session:
+                    session.analyse(boards[i], limit)
+            list(executor.map(run, range(len(boards))))
+        return len(boards) / (time.perf_counter() - start)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    import sys
+    print(yaml.safe_dump([asdict(p) for p in plan_profiles(int(sys.argv[1]) if len(sys.argv) > 1 else 1, pin = True)]))
@@ -1,9 +1,12 @@
 import chess
 from chess.pgn import Game
-from chess import square_rank, Color, Board, Square, Piece, square_distance, popcount, WHITE, BLACK, ray, scan_forward, Move
+from chess import square_rank, Color, Board, Square, Piece, square_distance, ray, Move
 from chess import KING, QUEEN, ROOK, BISHOP, KNIGHT, PAWN
 from typing import List, Tuple
 from chess.pgn import ChildNode
+from profiler import profiled
+from see import see, VALUES as see_values
+from pins import pins
 
 values = { PAWN: 1, KNIGHT: 3, BISHOP: 3, ROOK: 5, QUEEN: 9 }
 ray_piece_types = [QUEEN, ROOK, BISHOP]
@@ -11,7 +14,7 @@ class Puzzle:
 
     def __init__(self, node):
         self.node = node
-        self.tags = [name for name, fn  in self.tactics() if fn(node)]
+        self.tags = [name for name, fn  in self.tactics() if fn(node.parent.board().fen(), node.move.uci())]
     
     def tactics(self):
         return [
@@ -19,6 +22,7 @@ class Puzzle:
             ("pin", pin)
         ]
 
+@profiled
 def fork(fen: str, best_move: str) -> bool:
     game = _node_from_fen_with_last_move(fen, best_move)
     nb = 0
@@ -29,34 +33,31 @@ def fork(fen: str, best_move: str) -> bool:
             nb += 1
     return nb > 1
 
+@profiled
 def pin(fen:str, best_move: str) -> bool:
     node = _node_from_fen_with_last_move(fen, best_move)
-    return pin_prevents_escape(node)
+    return pin_prevents_attack(node) or pin_prevents_escape(node)
 
-def _node_from_fen_with_last_move(fen: str, last_move: str) -> Game:
+def _node_from_fen_with_last_move(fen: str, last_move: str) -> ChildNode:
     board = Board(fen)
     node = Game.from_board(board)
-    node.add_main_variation(Move.from_uci(last_move))
-    return node
+    return node.add_main_variation(Move.from_uci(last_move))
 
 
 # the pinned piece can't attack a player piece
 def pin_prevents_attack(node: ChildNode) -> bool:
     board = node.board()
-    for square, piece in board.piece_map().items():
-        if piece.color == node.board().turn:
-            continue
-        pin_dir = board.pin(piece.color, square)
-        if pin_dir == chess.BB_ALL:
-            continue
+    pov = not board.turn
+    for square, pin in pins(board, board.turn).items():
         for attack in board.attacks(square):
             attacked = board.piece_at(attack)
             if (
                 attacked
-                and attacked.color == node.board().turn
-                and not attack in pin_dir
+                and attacked.color == pov
+                and not attack in pin.ray
+                and (pin.absolute or values[attacked.piece_type] < see_values[pin.behind_type])
                 and (
-                    values[attacked.piece_type] > values[piece.piece_type]
+                    values[attacked.piece_type] > values[pin.front_type]
                     or is_hanging(board, attacked, attack)
                 )
             ):
@@ -67,14 +68,12 @@ def pin_prevents_attack(node: ChildNode) -> bool:
 # the pinned piece can't escape the attack
 def pin_prevents_escape(node: Game) -> bool:
     board = node.board()
-    for pinned_square, pinned_piece in board.piece_map().items():
-        if pinned_piece.color == node.board().turn:
-            continue
-        pin_dir = board.pin(pinned_piece.color, pinned_square)
-        if pin_dir == chess.BB_ALL:
-            continue
-        for attacker_square in board.attackers(node.board().turn, pinned_square):
-            if attacker_square in pin_dir:
+    pov = not board.turn
+    for pinned_square, pin in pins(board, board.turn).items():
+        pinned_piece = board.piece_at(pinned_square)
+        assert pinned_piece
+        for attacker_square in board.attackers(pov, pinned_square):
+            if attacker_square in pin.ray:
                 attacker = board.piece_at(attacker_square)
                 assert attacker
                 if (
@@ -85,12 +84,12 @@ def pin_prevents_escape(node: Game) -> bool:
                 if (
                     is_hanging(board, pinned_piece, pinned_square)
                     and pinned_square
-                    not in board.attackers(not node.board().turn, attacker_square)
+                    not in board.attackers(board.turn, attacker_square)
                     and [
                         m
                         for m in board.pseudo_legal_moves
                         if m.from_square == pinned_square
-                        and m.to_square not in pin_dir
+                        and m.to_square not in pin.ray
                     ]
                 ):
                     return True
@@ -127,32 +126,8 @@ def attacked_opponent_squares(board: Board, from_square: Square, pov: Color) ->
     return pieces
 
 def is_square_attacked_more_than_defended(board: Board, square: Square, pov: Color) -> bool:
-    attackers_white = board.attackers_mask(WHITE, square)
-    attackers_black = board.attackers_mask(BLACK, square)
-    
-    # Check for x-ray attacks
-    for color, attackers in [(WHITE, attackers_white), (BLACK, attackers_black)]:
-        for attacker_square in scan_forward(attackers):
-            attacker_piece = board.piece_at(attacker_square)
-            if attacker_piece and attacker_piece.piece_type in [BISHOP, ROOK, QUEEN]:
-                # Create a copy of the board and remove the blocking piece
-                board_copy = board.copy()
-                board_copy.remove_piece_at(attacker_square)
-                
-                # Check for x-ray attacks
-                xray_attackers = board_copy.attackers_mask(color, square)
-                if color == WHITE:
-                    attackers_white |= xray_attackers
-                else:
-                    attackers_black |= xray_attackers
-    
-    num_attackers_white = popcount(attackers_white)
-    num_attackers_black = popcount(attackers_black)
-    
-    if pov:
-        return num_attackers_black > num_attackers_white
-    return num_attackers_white > num_attackers_black
-
+    # the piece pov has on square loses material to the exchange
+    return see(board, square, not pov) > 0
 
 
 def is_hanging(board: Board, piece: Piece, square: Square) -> bool:
@@ -2,10 +2,12 @@ import sqlite3
 import pickle
 
 import sys
+import os
 import chess.pgn
 from chess.engine import SimpleEngine, Mate, Cp, Score, PovScore
 from typing import List, Optional, Literal, Union, Set, Tuple
 import copy
+import time
 from io import StringIO
 import math
 from dataclasses import dataclass, field
@@ -21,13 +23,29 @@ from chess import (
     Piece,
     PieceType,
     square_distance,
+    BB_SQUARES,
 )
-import Puzzle, EngineMove, NextMovePair, TagKind from model
+from model import Puzzle, EngineMove, NextMovePair, TagKind
+from profiler import profiled, profiler
+from engine import hash_size_mb
+from tablebase import Tablebase
+from tags import add_mask_column, decode_tags, encode_tags
+from mate_patterns import MatePosition, mate_pattern
+from geometry import BACK_RANK, DISTANCE, HOME_RANKS, PAWN_SHIELD
+import see
+from pins import pins, skewers
+from tag_cache import TagCache, cache_key
+from admission import Admission, Tiers
+from mate_in_one import non_mating_moves
+from classifier import FULL, SHALLOW, SKIP, CandidateLog, PuzzleGate, shallow_limit
 pair_limit = chess.engine.Limit(depth = 50, time = 30, nodes = 25_000_000)
 mate_defense_limit = chess.engine.Limit(depth = 15, time = 10, nodes = 8_000_000)
+# multipv 2 glance before pair_limit, most candidates already show two good moves this early
+prefilter_limit = chess.engine.Limit(nodes = 5_000)
 
-from util import get_next_move_pair, material_count, material_diff, is_up_in_material, maximum_castling_rights, win_chances, count_mates
+from util import get_next_move_pair, material_count, material_diff, is_up_in_material, maximum_castling_rights, win_chances
 
+@profiled
 def advanced_pawn(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         if util.is_very_advanced_pawn_move(node):
@@ -35,6 +53,7 @@ def advanced_pawn(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def double_check(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         if len(node.board().checkers()) > 1:
@@ -42,6 +61,7 @@ def double_check(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def sacrifice(puzzle: Puzzle) -> bool:
     # down in material compared to initial position, after moving
     diffs = [util.material_diff(n.board(), puzzle.pov) for n in puzzle.mainline]
@@ -52,6 +72,7 @@ def sacrifice(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def x_ray(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][1:]:
         if not util.is_capture(node):
@@ -75,11 +96,12 @@ def x_ray(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def fork(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][:-1]:
         if util.moved_piece_type(node) is not KING:
             board = node.board()
-            if util.is_in_bad_spot(board, node.move.to_square):
+            if see.is_in_bad_spot(board, node.move.to_square):
                 continue
             nb = 0
             for piece, square in util.attacked_opponent_squares(
@@ -90,7 +112,7 @@ def fork(puzzle: Puzzle) -> bool:
                 if util.king_values[piece.piece_type] > util.king_values[
                     util.moved_piece_type(node)
                 ] or (
-                    util.is_hanging(board, piece, square)
+                    see.is_hanging(board, square)
                     and square
                     not in board.attackers(not puzzle.pov, node.move.to_square)
                 ):
@@ -100,6 +122,7 @@ def fork(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def hanging_piece(puzzle: Puzzle) -> bool:
     to = puzzle.mainline[1].move.to_square
     captured = puzzle.mainline[0].board().piece_at(to)
@@ -108,7 +131,7 @@ def hanging_piece(puzzle: Puzzle) -> bool:
     ):
         return False
     if captured and captured.piece_type != PAWN:
-        if util.is_hanging(puzzle.mainline[0].board(), captured, to):
+        if see.is_hanging(puzzle.mainline[0].board(), to):
             op_move = puzzle.mainline[0].move
             op_capture = puzzle.game.board().piece_at(op_move.to_square)
             if (
@@ -127,6 +150,7 @@ def hanging_piece(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def trapped_piece(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][1:]:
         square = node.move.to_square
@@ -141,10 +165,12 @@ def trapped_piece(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def overloading(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def discovered_attack(puzzle: Puzzle) -> bool:
     if discovered_check(puzzle):
         return True
@@ -175,6 +201,7 @@ def discovered_check(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def quiet_move(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline:
         if (
@@ -200,6 +227,7 @@ def quiet_move(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def defensive_move(puzzle: Puzzle) -> bool:
     # like quiet_move, but on last move
     # at least 3 legal moves
@@ -216,6 +244,7 @@ def defensive_move(puzzle: Puzzle) -> bool:
     return not util.is_advanced_pawn_move(node)
 
 
+@profiled
 def check_escape(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         if node.board().is_check() or util.is_capture(node):
@@ -227,6 +256,7 @@ def check_escape(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def attraction(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1:]:
         if node.turn() == puzzle.pov:
@@ -256,6 +286,7 @@ def attraction(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def deflection(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][1:]:
         captured_piece = node.parent.board().piece_at(node.move.to_square)
@@ -302,33 +333,23 @@ def deflection(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def exposed_king(puzzle: Puzzle) -> bool:
-    if puzzle.pov:
-        pov = puzzle.pov
-        board = puzzle.mainline[0].board()
-    else:
-        pov = not puzzle.pov
-        board = puzzle.mainline[0].board().mirror()
-    king = board.king(not pov)
+    defender = not puzzle.pov
+    board = puzzle.mainline[0].board()
+    king = board.king(defender)
     assert king is not None
-    if chess.square_rank(king) < 5:
+    if not BB_SQUARES[king] & HOME_RANKS[defender]:
+        return False
+    if PAWN_SHIELD[defender][king] & board.pieces_mask(PAWN, defender):
         return False
-    squares = SquareSet.from_square(king - 8)
-    if chess.square_file(king) > 0:
-        squares.add(king - 1)
-        squares.add(king - 9)
-    if chess.square_file(king) < 7:
-        squares.add(king + 1)
-        squares.add(king - 7)
-    for square in squares:
-        if board.piece_at(square) == Piece(PAWN, not pov):
-            return False
     for node in puzzle.mainline[1::2][1:-1]:
         if node.board().is_check():
             return True
     return False
 
 
+@profiled
 def skewer(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][1:]:
         prev = node.parent
@@ -339,21 +360,21 @@ def skewer(puzzle: Puzzle) -> bool:
             and util.moved_piece_type(node) in util.ray_piece_types
             and not node.board().is_checkmate()
         ):
-            between = SquareSet.between(node.move.from_square, node.move.to_square)
             op_move = prev.move
             assert op_move
-            if (
-                op_move.to_square == node.move.to_square
-                or not op_move.from_square in between
-            ):
+            if op_move.to_square == node.move.to_square:
                 continue
-            if util.king_values[util.moved_piece_type(prev)] > util.king_values[
-                capture.piece_type
-            ] and util.is_in_bad_spot(prev.board(), node.move.to_square):
+            # the opponent moved the front piece of a skewer off the line
+            if any(
+                line.front == op_move.from_square and line.behind == node.move.to_square
+                for line in skewers(prev.parent.board(), puzzle.pov)
+                if line.slider == node.move.from_square
+            ) and see.is_in_bad_spot(prev.board(), node.move.to_square):
                 return True
     return False
 
 
+@profiled
 def self_interference(puzzle: Puzzle) -> bool:
     # intereference by opponent piece
     for node in puzzle.mainline[1::2][1:]:
@@ -379,6 +400,7 @@ def self_interference(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def interference(puzzle: Puzzle) -> bool:
     # intereference by player piece
     for node in puzzle.mainline[1::2][1:]:
@@ -411,6 +433,7 @@ def interference(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def intermezzo(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][1:]:
         if util.is_capture(node):
@@ -435,23 +458,20 @@ def intermezzo(puzzle: Puzzle) -> bool:
 
 
 # the pinned piece can't attack a player piece
+@profiled
 def pin_prevents_attack(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         board = node.board()
-        for square, piece in board.piece_map().items():
-            if piece.color == puzzle.pov:
-                continue
-            pin_dir = board.pin(piece.color, square)
-            if pin_dir == chess.BB_ALL:
-                continue
+        for square, pin in pins(board, not puzzle.pov).items():
             for attack in board.attacks(square):
                 attacked = board.piece_at(attack)
                 if (
                     attacked
                     and attacked.color == puzzle.pov
-                    and not attack in pin_dir
+                    and not attack in pin.ray
+                    and (pin.absolute or util.values[attacked.piece_type] < util.values[pin.behind_type])
                     and (
-                        util.values[attacked.piece_type] > util.values[piece.piece_type]
+                        util.values[attacked.piece_type] > util.values[pin.front_type]
                         or util.is_hanging(board, attacked, attack)
                     )
                 ):
@@ -460,17 +480,15 @@ def pin_prevents_attack(puzzle: Puzzle) -> bool:
 
 
 # the pinned piece can't escape the attack
+@profiled
 def pin_prevents_escape(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         board = node.board()
-        for pinned_square, pinned_piece in board.piece_map().items():
-            if pinned_piece.color == puzzle.pov:
-                continue
-            pin_dir = board.pin(pinned_piece.color, pinned_square)
-            if pin_dir == chess.BB_ALL:
-                continue
+        for pinned_square, pin in pins(board, not puzzle.pov).items():
+            pinned_piece = board.piece_at(pinned_square)
+            assert pinned_piece
             for attacker_square in board.attackers(puzzle.pov, pinned_square):
-                if attacker_square in pin_dir:
+                if attacker_square in pin.ray:
                     attacker = board.piece_at(attacker_square)
                     assert attacker
                     if (
@@ -486,13 +504,14 @@ def pin_prevents_escape(puzzle: Puzzle) -> bool:
                             m
                             for m in board.pseudo_legal_moves
                             if m.from_square == pinned_square
-                            and m.to_square not in pin_dir
+                            and m.to_square not in pin.ray
                         ]
                     ):
                         return True
     return False
 
 
+@profiled
 def attacking_f2_f7(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         square = node.move.to_square
@@ -509,10 +528,12 @@ def attacking_f2_f7(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def kingside_attack(puzzle: Puzzle) -> bool:
     return side_attack(puzzle, 7, [6, 7], 20)
 
 
+@profiled
 def queenside_attack(puzzle: Puzzle) -> bool:
     return side_attack(puzzle, 0, [0, 1, 2], 18)
 
@@ -525,7 +546,7 @@ def side_attack(
     king_square = init_board.king(not puzzle.pov)
     if (
         not king_square
-        or square_rank(king_square) != back_rank
+        or not BB_SQUARES[king_square] & BACK_RANK[not puzzle.pov]
         or square_file(king_square) not in king_files
         or len(init_board.piece_map()) < nb_pieces  # no endgames
         or not any(node.board().is_check() for node in puzzle.mainline[1::2])
@@ -534,7 +555,7 @@ def side_attack(
     score = 0
     corner = chess.square(corner_file, back_rank)
     for node in puzzle.mainline[1::2]:
-        corner_dist = square_distance(corner, node.move.to_square)
+        corner_dist = DISTANCE[corner][node.move.to_square]
         if node.board().is_check():
             score += 1
         if util.is_capture(node) and corner_dist <= 3:
@@ -544,6 +565,7 @@ def side_attack(
     return score >= 2
 
 
+@profiled
 def clearance(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][1:]:
         board = node.board()
@@ -579,6 +601,7 @@ def clearance(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def en_passant(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         if (
@@ -590,6 +613,7 @@ def en_passant(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def castling(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         if util.is_castling(node):
@@ -597,6 +621,7 @@ def castling(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def promotion(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         if node.move.promotion:
@@ -604,6 +629,7 @@ def promotion(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def under_promotion(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2]:
         if node.board().is_checkmate():
@@ -613,6 +639,7 @@ def under_promotion(puzzle: Puzzle) -> bool:
     return False
 
 
+@profiled
 def capturing_defender(puzzle: Puzzle) -> bool:
     for node in puzzle.mainline[1::2][1:]:
         board = node.board()
@@ -646,168 +673,43 @@ def capturing_defender(puzzle: Puzzle) -> bool:
     return False
 
 
-def back_rank_mate(puzzle: Puzzle) -> bool:
+def mate_position(puzzle: Puzzle) -> MatePosition:
     node = puzzle.game.end()
-    board = node.board()
-    king = board.king(not puzzle.pov)
-    assert king is not None
     assert isinstance(node, ChildNode)
-    back_rank = 7 if puzzle.pov else 0
-    if board.is_checkmate() and square_rank(king) == back_rank:
-        squares = SquareSet.from_square(king + (-8 if puzzle.pov else 8))
-        if puzzle.pov:
-            if chess.square_file(king) < 7:
-                squares.add(king - 7)
-            if chess.square_file(king) > 0:
-                squares.add(king - 9)
-        else:
-            if chess.square_file(king) < 7:
-                squares.add(king + 9)
-            if chess.square_file(king) > 0:
-                squares.add(king + 7)
-        for square in squares:
-            piece = board.piece_at(square)
-            if (
-                piece is None
-                or piece.color == puzzle.pov
-                or board.attackers(puzzle.pov, square)
-            ):
-                return False
-        return any(square_rank(checker) == back_rank for checker in board.checkers())
-    return False
+    return MatePosition(node.board(), node.move, puzzle.pov)
 
 
+@profiled
+def back_rank_mate(puzzle: Puzzle) -> bool:
+    return mate_position(puzzle).back_rank()
+
+
+@profiled
 def anastasia_mate(puzzle: Puzzle) -> bool:
-    node = puzzle.game.end()
-    board = node.board()
-    king = board.king(not puzzle.pov)
-    assert king is not None
-    assert isinstance(node, ChildNode)
-    if square_file(king) in [0, 7] and square_rank(king) not in [0, 7]:
-        if square_file(node.move.to_square) == square_file(
-            king
-        ) and util.moved_piece_type(node) in [QUEEN, ROOK]:
-            if square_file(king) != 0:
-                board.apply_transform(chess.flip_horizontal)
-            king = board.king(not puzzle.pov)
-            assert king is not None
-            blocker = board.piece_at(king + 1)
-            if blocker is not None and blocker.color != puzzle.pov:
-                knight = board.piece_at(king + 3)
-                if (
-                    knight is not None
-                    and knight.color == puzzle.pov
-                    and knight.piece_type == KNIGHT
-                ):
-                    return True
-    return False
+    return mate_position(puzzle).anastasia()
 
 
+@profiled
 def hook_mate(puzzle: Puzzle) -> bool:
-    node = puzzle.game.end()
-    board = node.board()
-    king = board.king(not puzzle.pov)
-    assert king is not None
-    assert isinstance(node, ChildNode)
-    if (
-        util.moved_piece_type(node) == ROOK
-        and square_distance(node.move.to_square, king) == 1
-    ):
-        for rook_defender_square in board.attackers(puzzle.pov, node.move.to_square):
-            defender = board.piece_at(rook_defender_square)
-            if (
-                defender
-                and defender.piece_type == KNIGHT
-                and square_distance(rook_defender_square, king) == 1
-            ):
-                for knight_defender_square in board.attackers(
-                    puzzle.pov, rook_defender_square
-                ):
-                    pawn = board.piece_at(knight_defender_square)
-                    if pawn and pawn.piece_type == PAWN:
-                        return True
-    return False
+    return mate_position(puzzle).hook()
 
 
+@profiled
 def arabian_mate(puzzle: Puzzle) -> bool:
-    node = puzzle.game.end()
-    board = node.board()
-    king = board.king(not puzzle.pov)
-    assert king is not None
-    assert isinstance(node, ChildNode)
-    if (
-        square_file(king) in [0, 7]
-        and square_rank(king) in [0, 7]
-        and util.moved_piece_type(node) == ROOK
-        and square_distance(node.move.to_square, king) == 1
-    ):
-        for knight_square in board.attackers(puzzle.pov, node.move.to_square):
-            knight = board.piece_at(knight_square)
-            if (
-                knight
-                and knight.piece_type == KNIGHT
-                and (
-                    abs(square_rank(knight_square) - square_rank(king)) == 2
-                    and abs(square_file(knight_square) - square_file(king)) == 2
-                )
-            ):
-                return True
-    return False
+    return mate_position(puzzle).arabian()
 
 
+@profiled
 def boden_or_double_bishop_mate(puzzle: Puzzle) -> Optional[TagKind]:
-    node = puzzle.game.end()
-    board = node.board()
-    king = board.king(not puzzle.pov)
-    assert king is not None
-    assert isinstance(node, ChildNode)
-    bishop_squares = list(board.pieces(BISHOP, puzzle.pov))
-    if len(bishop_squares) < 2:
-        return None
-    for square in [s for s in SquareSet(chess.BB_ALL) if square_distance(s, king) < 2]:
-        if not all(
-            [
-                p.piece_type == BISHOP
-                for p in util.attacker_pieces(board, puzzle.pov, square)
-            ]
-        ):
-            return None
-    if (square_file(bishop_squares[0]) < square_file(king)) == (
-        square_file(bishop_squares[1]) > square_file(king)
-    ):
-        return "bodenMate"
-    else:
-        return "doubleBishopMate"
+    return mate_position(puzzle).boden_or_double_bishop()  # type: ignore
 
 
+@profiled
 def dovetail_mate(puzzle: Puzzle) -> bool:
-    node = puzzle.game.end()
-    board = node.board()
-    king = board.king(not puzzle.pov)
-    assert king is not None
-    assert isinstance(node, ChildNode)
-    if square_file(king) in [0, 7] or square_rank(king) in [0, 7]:
-        return False
-    queen_square = node.move.to_square
-    if (
-        util.moved_piece_type(node) != QUEEN
-        or square_file(queen_square) == square_file(king)
-        or square_rank(queen_square) == square_rank(king)
-        or square_distance(queen_square, king) > 1
-    ):
-        return False
-    for square in [s for s in SquareSet(chess.BB_ALL) if square_distance(s, king) == 1]:
-        if square == queen_square:
-            continue
-        attackers = list(board.attackers(puzzle.pov, square))
-        if attackers == [queen_square]:
-            if board.piece_at(square):
-                return False
-        elif attackers:
-            return False
-    return True
+    return mate_position(puzzle).dovetail()
 
 
+@profiled
 def piece_endgame(puzzle: Puzzle, piece_type: PieceType) -> bool:
     for board in [puzzle.mainline[i].board() for i in [0, 1]]:
         if not board.pieces(piece_type, WHITE) and not board.pieces(piece_type, BLACK):
@@ -818,6 +720,7 @@ def piece_endgame(puzzle: Puzzle, piece_type: PieceType) -> bool:
     return True
 
 
+@profiled
 def queen_rook_endgame(puzzle: Puzzle) -> bool:
     def test(board: Board) -> bool:
         pieces = board.piece_map().values()
@@ -830,24 +733,12 @@ def queen_rook_endgame(puzzle: Puzzle) -> bool:
     return all(test(puzzle.mainline[i].board()) for i in [0, 1])
 
 
+@profiled
 def smothered_mate(puzzle: Puzzle) -> bool:
-    board = puzzle.game.end().board()
-    king_square = board.king(not puzzle.pov)
-    assert king_square is not None
-    for checker_square in board.checkers():
-        piece = board.piece_at(checker_square)
-        assert piece
-        if piece.piece_type == KNIGHT:
-            for escape_square in [
-                s for s in chess.SQUARES if square_distance(s, king_square) == 1
-            ]:
-                blocker = board.piece_at(escape_square)
-                if not blocker or blocker.color == puzzle.pov:
-                    return False
-            return True
-    return False
+    return mate_position(puzzle).smothered()
 
 
+@profiled
 def mate_in(puzzle: Puzzle) -> Optional[TagKind]:
     if not puzzle.game.end().board().is_checkmate():
         return None
@@ -862,13 +753,26 @@ def mate_in(puzzle: Puzzle) -> Optional[TagKind]:
         return "mateIn4"
     return "mateIn5"
 
-def process_pgn_file(pgn_file, generator):
-    """ Reads a PGN file and analyzes each game to extract puzzles. """
+def process_pgn_file(pgn_file, generator, admission: Optional[Admission] = None):
+    """
+    Reads a PGN file and analyzes each game to extract puzzles.
+    With admission, games below its tiers are skipped and the others searched with their tier's limit.
+    """
+    headers: List[str] = []
     with open(pgn_file, "r", encoding="utf-8") as pgn:
         for line in pgn:
+            if line.startswith("[Event "):
+                headers = []
+            if line.startswith("["):
+                headers.append(line.strip())
             if line.startswith("[Site "):
                 site = line
             elif "%eval" in line:
+                if admission:
+                    tiers = Tiers.from_headers(headers)
+                    if not admission.admit(tiers):
+                        continue
+                    generator.pair_limit = admission.limit(tiers) or pair_limit
                 game = chess.pgn.read_game(StringIO("{}\n{}".format(site, line)))
                 puzzles = generator.analyze_game(game)
                 for puzzle in puzzles:
@@ -893,9 +797,24 @@ def win_chances(score: Score) -> float:
     MULTIPLIER = -0.00368208 # https://github.com/lichess-org/lila/pull/11148
     return 2 / (1 + math.exp(MULTIPLIER * cp)) - 1 if cp is not None else 0
 
+def cp_tag(cp: int) -> TagKind:
+    if cp > 600:
+        return "crushing"
+    if cp > 200:
+        return "advantage"
+    return "equality"
+
+
 class Generator:
-    def __init__(self, engine: SimpleEngine):
+    def __init__(self, engine: SimpleEngine, tablebase: Optional[Tablebase] = None, tag_cache: Optional[TagCache] = None,
+                 gate: Optional[PuzzleGate] = None, log: Optional[CandidateLog] = None):
         self.engine = engine
+        self.tablebase = tablebase
+        self.tag_cache = tag_cache
+        self.gate = gate
+        self.log = log
+        self.pair_limit = pair_limit
+        self.prefilter_limit: Optional[chess.engine.Limit] = prefilter_limit
     def analyze_game(self, game: Game) -> List[Puzzle]:
         result = []
         prev_score: Score = Cp(20)
@@ -922,33 +841,27 @@ class Generator:
     
     
     def tag_puzzle(self, puzzle: Puzzle) -> None:
+        key = cache_key(puzzle.game.board(), [node.move for node in puzzle.mainline])
+        tags = self.tag_cache.get(key) if self.tag_cache else None
+        if tags is None:
+            tags = self.line_tags(puzzle)
+            if self.tag_cache:
+                self.tag_cache.put(key, tags)
+        if "mate" not in tags:
+            tags.insert(0, cp_tag(puzzle.cp))
+        puzzle.tags = tags  # type: ignore
+
+    def line_tags(self, puzzle: Puzzle) -> List[TagKind]:
+        """ Every tag but the eval one, which only depends on the moves and the position they start from """
         tags: List[TagKind] = []
         mate_tag = mate_in(puzzle)
         if mate_tag:
             tags.append(mate_tag)
             tags.append("mate")
-            if smothered_mate(puzzle):
-                tags.append("smotheredMate")
-            elif back_rank_mate(puzzle):
-                tags.append("backRankMate")
-            elif anastasia_mate(puzzle):
-                tags.append("anastasiaMate")
-            elif hook_mate(puzzle):
-                tags.append("hookMate")
-            elif arabian_mate(puzzle):
-                tags.append("arabianMate")
-            else:
-                found = boden_or_double_bishop_mate(puzzle)
-                if found:
-                    tags.append(found)
-                elif dovetail_mate(puzzle):
-                    tags.append("dovetailMate")
-        elif puzzle.cp > 600:
-            tags.append("crushing")
-        elif puzzle.cp > 200:
-            tags.append("advantage")
-        else:
-            tags.append("equality")
+            end = puzzle.game.end()
+            pattern = mate_pattern(end.board(), end.move, puzzle.pov)
+            if pattern:
+                tags.append(pattern)  # type: ignore
 
         if attraction(puzzle):
             tags.append("attraction")
@@ -1052,7 +965,7 @@ class Generator:
         # else:
         #     tags.append("long")
 
-        puzzle.tags = tags
+        return tags
 
 
 
@@ -1078,25 +991,51 @@ class Generator:
         #     return Puzzle(node, mate_solution, 999999999, [], game), score
         if score >= Cp(200) and win_chances(score) > win_chances(prev_score) + ADVANTAGE_THRESHOLD:
             print("Advantage {}#{} {} -> {}. Probing...".format(game_url, node.ply(), prev_score, score))
-            puzzle_node = copy.deepcopy(node)
-            solution : Optional[List[NextMovePair]] = self.cook_advantage(puzzle_node, winner)
-            if not solution:
-                return None, score
-            while len(solution) % 2 == 0 or not solution[-1].second:
-                if not solution[-1].second:
-                    print("Remove final only-move")
-                solution = solution[:-1]
-            # if not solution or len(solution) == 1 :
-            #     print("Discard one-mover") # Keep one mover for now
-            #     return None, score
-            if not solution:
+            swing = win_chances(score) - win_chances(prev_score)
+            budget = self.gate.decide(board, swing) if self.gate else FULL
+            if budget == SKIP:
+                print("Unlikely puzzle, skipping")
                 return None, score
-            cp = solution[len(solution) - 1].best.score.score()
-            puzzle = Puzzle(node, [p.best.move for p in solution], 999999998 if cp is None else cp)
-            self.tag_puzzle(puzzle)
+            full_limit = self.pair_limit
+            if budget == SHALLOW:
+                self.pair_limit = shallow_limit
+            start = time.perf_counter()
+            try:
+                puzzle = self.cook_puzzle(node, winner)
+            finally:
+                self.pair_limit = full_limit
+            # gated runs would only teach the gate its own decisions
+            if self.log and budget == FULL:
+                tag_mask = encode_tags(puzzle.tags) if puzzle else 0
+                self.log.record(board, swing, puzzle is not None, tag_mask, time.perf_counter() - start)
             return puzzle, score
         else:
             return None, score
+
+    def cook_puzzle(self, node: ChildNode, winner: Color) -> Optional[Puzzle]:
+        puzzle_node = copy.deepcopy(node)
+        solution : Optional[List[NextMovePair]] = self.cook_advantage(puzzle_node, winner)
+        if not solution:
+            return None
+        while len(solution) % 2 == 0 or not solution[-1].second:
+            if not solution[-1].second:
+                print("Remove final only-move")
+            solution = solution[:-1]
+        # if not solution or len(solution) == 1 :
+        #     print("Discard one-mover") # Keep one mover for now
+        #     return None
+        if not solution:
+            return None
+        cp = solution[len(solution) - 1].best.score.score()
+        moves = [p.best.move for p in solution]
+        # from before the opponent's mistake, like the puzzle lines the tagger reads
+        game = Game.from_board(node.parent.board())
+        line = game.add_main_variation(node.move)
+        for move in moves:
+            line = line.add_main_variation(move)
+        puzzle = Puzzle(node, moves, 999999998 if cp is None else cp, [], game)
+        self.tag_puzzle(puzzle)
+        return puzzle
     
     def cook_advantage(self, node: ChildNode, winner: Color) -> Optional[List[NextMovePair]]:
 
@@ -1129,16 +1068,24 @@ class Generator:
             return True
         if pair.second.score == Mate(1):
             # if there's more than one mate in one, gotta look if the best non-mating move is bad enough
+            board = pair.node.board()
+            others = non_mating_moves(board)
+            if not others:
+                return True
             print('Looking for best non-mating move...')
-            mates = util.count_mates(copy.deepcopy(pair.node.board()))
-            info = self.engine.analyse(pair.node.board(), multipv = mates + 1, limit = pair_limit)
-            scores =  [pv["score"].pov(pair.winner) for pv in info]
-            # the first non-matein1 move is the last element
-            if scores[-1] < Mate(1) and win_chances(scores[-1]) > non_mate_win_threshold:
-                    return False
+            score = self.non_mating_score(pair, others, self.prefilter_limit) if self.prefilter_limit else None
+            # a shallow eval only settles it when it's clearly on one side of the threshold
+            if score is None or abs(win_chances(score) - non_mate_win_threshold) <= PREFILTER_MARGIN:
+                score = self.non_mating_score(pair, others, self.pair_limit)
+            if score < Mate(1) and win_chances(score) > non_mate_win_threshold:
+                return False
             return True
         return False
 
+    def non_mating_score(self, pair: NextMovePair, others: List[Move], limit: chess.engine.Limit) -> Score:
+        info = self.engine.analyse(pair.node.board(), multipv = 1, limit = limit, root_moves = others, game = pair.node.game())
+        return info[0]["score"].pov(pair.winner)
+
     # is pair.best the only continuation?
     def is_valid_attack(self, pair: NextMovePair) -> bool:
         return (
@@ -1165,15 +1112,47 @@ class Generator:
             not util.is_advanced_pawn_move(node)
             and util.moved_piece_type(node) != KING)
 
+    def get_tablebase_pair(self, node: ChildNode, winner: Color) -> Optional[NextMovePair]:
+        result = self.tablebase.probe(node.board()) if self.tablebase else None
+        if not result:
+            return None
+        turn = node.board().turn
+        best = EngineMove(result.best.move, PovScore(result.best.score(), turn).pov(winner))
+        second = EngineMove(result.second.move, PovScore(result.second.score(), turn).pov(winner)) if result.second else None
+        return NextMovePair(node, winner, best, second)
+
+    @profiled
+    def lacks_only_move(self, node: ChildNode, winner: Color) -> bool:
+        """
+        Whether a shallow search already finds a second move close to the best one, by more than PREFILTER_MARGIN
+        below ONLY_MOVE_THRESHOLD. Mates are left to the deep search, mate in one has its own rules.
+        """
+        if not self.prefilter_limit:
+            return False
+        # not through get_next_move_pair: its timings and engine metrics are for pair_limit searches only
+        info = self.engine.analyse(node.board(), multipv = 2, limit = self.prefilter_limit, game = node.game())
+        glance = util.move_pair(info, node, winner)
+        if not glance.second or glance.best.score.is_mate() or glance.second.score.is_mate():
+            return False
+        return win_chances(glance.best.score) <= win_chances(glance.second.score) + ONLY_MOVE_THRESHOLD - PREFILTER_MARGIN
+
     def get_next_pair(self, node: ChildNode, winner: Color) -> Optional[NextMovePair]:
-        pair = get_next_move_pair(self.engine, node, winner, pair_limit)
+        # every ply of a line shares the root game as session key, so the engine keeps its hash between them
+        # and clears it with ucinewgame once a line of another game starts
+        pair = self.get_tablebase_pair(node, winner)
+        if not pair:
+            if node.board().turn == winner and self.lacks_only_move(node, winner):
+                print("No more chaos at a glance {}".format(node.board().fen()))
+                return None
+            pair = get_next_move_pair(self.engine, node, winner, self.pair_limit, game = node.game())
         if node.board().turn == winner and not self.is_valid_attack(pair):
             print("No more chaos {}".format(pair))
             return None
         return pair
 
+    @profiled
     def get_next_move(self, node: ChildNode, limit: chess.engine.Limit) -> Optional[Move]:
-        result = self.engine.play(node.board(), limit = limit)
+        result = self.engine.play(node.board(), limit = limit, game = node.game())
         return result.move if result else None
 
     def cook_mate(self, node: ChildNode, winner: Color) -> Optional[List[Move]]:
@@ -1219,7 +1198,8 @@ def analyze_game(game: Game, generator) -> List[Puzzle]:
 
 def make_engine(executable: str, threads: int) -> SimpleEngine:
     engine = SimpleEngine.popen_uci(executable)
-    engine.configure({'Threads': threads})
+    engine.configure({'Threads': threads, 'Hash': hash_size_mb()})
+    util.engine_metrics(engine)
     return engine
 
 
@@ -1233,9 +1213,11 @@ def create_database():
         moves BLOB,
         cp INTEGER,
         tags TEXT,
-        game BLOB
+        game BLOB,
+        tag_mask INTEGER NOT NULL DEFAULT 0
     )
     """)
+    add_mask_column(conn)
     
     conn.commit()
     conn.close()
@@ -1252,9 +1234,9 @@ def save_puzzle(puzzle: Puzzle):
     game_blob = pickle.dumps(puzzle.game)
 
     cursor.execute("""
-    INSERT INTO puzzles (moves, cp, tags, game) 
-    VALUES (?, ?, ?, ?)
-    """, (moves_blob, puzzle.cp, tags_str, game_blob))
+    INSERT INTO puzzles (moves, cp, tags, game, tag_mask) 
+    VALUES (?, ?, ?, ?, ?)
+    """, (moves_blob, puzzle.cp, tags_str, game_blob, encode_tags(puzzle.tags)))
     
     conn.commit()
     conn.close()
@@ -1263,17 +1245,17 @@ def load_puzzles():
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
-    cursor.execute("SELECT moves, cp, tags, game FROM puzzles")
+    cursor.execute("SELECT moves, cp, tag_mask, game FROM puzzles")
     rows = cursor.fetchall()
 
     puzzles = []
     for row in rows:
         moves = pickle.loads(row[0])
         cp = row[1]
-        tags = row[2].split(",")
+        tags = decode_tags(row[2])
         game = pickle.loads(row[3])
 
-        puzzle = Puzzle(node=None, moves=moves, cp=cp)
+        puzzle = Puzzle(node=game.variations[0] if game.variations else None, moves=moves, cp=cp, tags=tags, game=game)
         puzzles.append(puzzle)
 
     conn.close()
@@ -1283,12 +1265,21 @@ def load_puzzles():
 PGN_FILE = "./data/0YiOyDOR.pgn"  # Change this to the actual filename
 mate_soon = Mate(15)
 DB_FILE = "puzzles.db"
+SYZYGY_PATH = os.getenv("SYZYGY_PATH")
+PROFILE_FILE = "profile.prom"
 ADVANTAGE_THRESHOLD = 0.6
 ONLY_MOVE_THRESHOLD = 0.35
+# win chances the prefilter's gap has to miss ONLY_MOVE_THRESHOLD by, shallow evals are noisy
+PREFILTER_MARGIN = 0.15
 if __name__ == "__main__":
     sys.setrecursionlimit(10000) # else node.deepcopy() sometimes fails?
     create_database()
     engine = make_engine('stockfish', '16')
-    generator = Generator(engine)
+    tag_cache = TagCache(DB_FILE)
+    generator = Generator(engine, Tablebase(SYZYGY_PATH), tag_cache)
     process_pgn_file(PGN_FILE, generator)
+    tag_cache.close()
+    print("Tag cache hit rate {:.1%}".format(tag_cache.hit_rate()))
+    if profiler.enabled:
+        profiler.dump(PROFILE_FILE)
     print("Done")
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from typing import List, Optional, Tuple
+from chess import Board, Color, Move, BLACK, WHITE
+from chess.engine import Cp, Mate, PovScore, Score
+from chess.pgn import Game
+from classifier import CandidateLog, PuzzleGate, shallow_limit
+from main import Generator, pair_limit, prefilter_limit
+from model import EngineMove, NextMovePair
+from metrics import engine_metrics
+from tags import encode_tags
+from test_classifier import ConstantModel
+
+class PairEngine:
+    """ stands in for stockfish: the first two legal moves with fixed scores, records every limit it's given """
+
+    def __init__(self, best: Score, second: Score, pov: Optional[Color] = None):
+        self.best = best
+        self.second = second
+        # scores are for the side to move unless pov is given
+        self.pov = pov
+        self.limits = []
+
+    def analyse(self, board, multipv, limit, game = None, root_moves = None):
+        self.limits.append(limit)
+        moves = list(board.legal_moves)
+        pov = board.turn if self.pov is None else self.pov
+        info = [{"pv": [moves[0]], "score": PovScore(self.best, pov)}, {"pv": [moves[1]], "score": PovScore(self.second, pov)}]
+        return info[:multipv]
+
+class LineEngine(PairEngine):
+    """ PairEngine playing a scripted (best, second) pair per analysis, scored for winner """
+
+    def __init__(self, winner: Color, pairs: List[Tuple[Score, Score]]):
+        super().__init__(Cp(0), Cp(0), winner)
+        self.pairs = iter(pairs)
+
+    def analyse(self, board, multipv, limit, game = None, root_moves = None):
+        self.best, self.second = next(self.pairs)
+        return super().analyse(board, multipv, limit, game, root_moves)
+
+def candidate():
+    """ black to move after 1. e4, with a jump from -3 to +8 for black """
+    node = Game().add_variation(Move.from_uci("e2e4"))
+    return node, Cp(-300), PovScore(Cp(-800), WHITE)
+
+class TestGate(unittest.TestCase):
+
+    def test_skipped_candidates_never_reach_the_engine(self) -> None:
+        engine = PairEngine(Cp(300), Cp(280))
+        gen = Generator(engine, gate = PuzzleGate(ConstantModel(0.01), 0.1, 0.5))
+        puzzle, _ = gen.analyze_position(*candidate(), None)
+        self.assertIsNone(puzzle)
+        self.assertEqual(engine.limits, [])
+
+    def test_shallow_budget_replaces_pair_limit(self) -> None:
+        engine = PairEngine(Cp(300), Cp(280))
+        gen = Generator(engine, gate = PuzzleGate(ConstantModel(0.3), 0.1, 0.5))
+        gen.prefilter_limit = None
+        gen.analyze_position(*candidate(), None)
+        self.assertEqual(engine.limits, [shallow_limit])
+        self.assertEqual(gen.pair_limit, pair_limit)
+
+    def test_log_labels_candidates_by_puzzle(self) -> None:
+        log = CandidateLog(os.path.join(tempfile.mkdtemp(), "puzzles.db"))
+        gen = Generator(PairEngine(Cp(300), Cp(280)), log = log)
+        gen.prefilter_limit = None
+        gen.analyze_position(*candidate(), None)
+        _, labels, masks, _ = log.load()
+        self.assertEqual(list(labels), [0])
+        self.assertEqual(list(masks), [0])
+        log.close()
+
+    def test_log_labels_a_cooked_puzzle(self) -> None:
+        log = CandidateLog(os.path.join(tempfile.mkdtemp(), "puzzles.db"))
+        # an only move, the opponent's reply, then two good moves end the line
+        engine = LineEngine(BLACK, [(Cp(800), Cp(-100)), (Cp(800), Cp(700)), (Cp(800), Cp(790))])
+        gen = Generator(engine, log = log)
+        gen.prefilter_limit = None
+        puzzle, _ = gen.analyze_position(*candidate(), None)
+        assert puzzle
+        self.assertEqual([node.move for node in puzzle.mainline], [Move.from_uci("e2e4")] + puzzle.moves)
+        self.assertEqual(len(puzzle.moves), 1)
+        self.assertIn("crushing", puzzle.tags)
+        _, labels, masks, _ = log.load()
+        self.assertEqual(list(labels), [1])
+        self.assertEqual(list(masks), [encode_tags(puzzle.tags)])
+        log.close()
+
+class TestPrefilter(unittest.TestCase):
+
+    def next_pair(self, best: Score, second: Score):
+        engine = PairEngine(best, second)
+        node, _, _ = candidate()
+        return Generator(engine).get_next_pair(node, BLACK), engine
+
+    def test_small_gap_stops_before_the_deep_search(self) -> None:
+        pair, engine = self.next_pair(Cp(300), Cp(280))
+        self.assertIsNone(pair)
+        self.assertEqual(engine.limits, [prefilter_limit])
+        self.assertEqual(engine_metrics(engine).analyses.value, 0)
+
+    def test_large_gap_reaches_pair_limit(self) -> None:
+        pair, engine = self.next_pair(Cp(800), Cp(-100))
+        self.assertIsNotNone(pair)
+        self.assertEqual(engine.limits, [prefilter_limit, pair_limit])
+        # only the deep search counts as a pair analysis
+        self.assertEqual(engine_metrics(engine).analyses.value, 1)
+
+    def test_mates_are_never_prefiltered(self) -> None:
+        _, engine = self.next_pair(Mate(3), Mate(4))
+        self.assertEqual(engine.limits, [prefilter_limit, pair_limit])
+
+class TestMateInOne(unittest.TestCase):
+
+    def non_mating_search(self, score: Score):
+        """ validity of a back rank mate Ra8# with Re8# also mating, and the limits the check searched with """
+        node = Game.from_board(Board("6k1/5ppp/8/8/8/8/8/R3R1K1 w - - 0 1"))
+        pair = NextMovePair(node, WHITE, EngineMove(Move.from_uci("a1a8"), Mate(1)), EngineMove(Move.from_uci("e1e8"), Mate(1)))
+        engine = PairEngine(score, score)
+        return Generator(engine).is_valid_mate_in_one(pair), engine.limits
+
+    def test_clear_shallow_results_skip_the_deep_search(self) -> None:
+        self.assertEqual(self.non_mating_search(Cp(900)), (False, [prefilter_limit]))
+        self.assertEqual(self.non_mating_search(Cp(0)), (True, [prefilter_limit]))
+
+    def test_close_shallow_result_goes_deep(self) -> None:
+        self.assertEqual(self.non_mating_search(Cp(300)), (True, [prefilter_limit, pair_limit]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+from chess import Board, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, popcount
+
+VALUES = {PAWN: 1, KNIGHT: 3, BISHOP: 3, ROOK: 5, QUEEN: 9}
+# legal moves above which more choice stops mattering
+MOBILITY_CAP = 40
+
+
+@dataclass
+class Weights:
+    """ Share of the yield score each signal is worth, they add up to 1 """
+    swing: float = 0.55
+    capture: float = 0.15
+    balance: float = 0.2
+    mobility: float = 0.1
+
+
+def material_diff(board: Board) -> int:
+    """ Side to move's material minus the opponent's, in pawns """
+    return sum(
+        value * (popcount(board.pieces_mask(piece_type, board.turn)) - popcount(board.pieces_mask(piece_type, not board.turn)))
+        for piece_type, value in VALUES.items()
+    )
+
+
+def expected_yield(board: Board, swing: float, capture: bool, weights: Optional[Weights] = None) -> float:
+    """
+    From 0 to 1, how likely a candidate is to make a puzzle from signals that cost no search:
+    a big eval swing, a previous move that took something, material still close and moves to choose from.
+    Positions with a single legal move never make one.
+    """
+    weights = weights or Weights()
+    legal_moves = board.legal_moves.count()
+    if legal_moves < 2:
+        return 0.0
+    return (
+        weights.swing * min(max(swing, 0.0), 1.0)
+        + weights.capture * capture
+        + weights.balance / (1 + abs(material_diff(board)) / 3)
+        + weights.mobility * min(legal_moves, MOBILITY_CAP) / MOBILITY_CAP
+    )
+
+
+class Scheduler:
+    """
+    Scores candidates with expected_yield and keeps a global deadline: once budget seconds have
+    passed since the first candidate was analysed, the rest are skipped.
+    engine_seconds sums what the analyses took, across every engine of a pool.
+    """
+
+    def __init__(self, budget: Optional[float] = None, weights: Optional[Weights] = None, clock: Callable[[], float] = time.monotonic):
+        self.budget = budget
+        self.weights = weights or Weights()
+        self.clock = clock
+        self.started: Optional[float] = None
+        self.engine_seconds = 0.0
+        self.analysed = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def score(self, board: Board, swing: float, capture: bool) -> float:
+        return expected_yield(board, swing, capture, self.weights)
+
+    def admit(self) -> bool:
+        """ Whether there is time left for one more analysis, starts the clock on the first call """
+        with self.lock:
+            now = self.clock()
+            if self.started is None:
+                self.started = now
+            if self.budget is not None and now - self.started >= self.budget:
+                self.skipped += 1
+                return False
+            return True
+
+    def spent(self, seconds: float) -> None:
+        with self.lock:
+            self.engine_seconds += seconds
+            self.analysed += 1
+
+    def expired(self) -> bool:
+        with self.lock:
+            return self.budget is not None and self.started is not None and self.clock() - self.started >= self.budget
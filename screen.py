@@ -0,0 +1,144 @@
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from chess import Board, WHITE
+from chess.engine import PovScore
+from chess.pgn import EVAL_REGEX
+
+MULTIPLIER = -0.00368208 # https://github.com/lichess-org/lila/pull/11148
+# win chances of the Cp(20) the generator assumes before the first move
+INITIAL_WIN_CHANCES = 2 / (1 + np.exp(MULTIPLIER * 20)) - 1
+
+
+def eval_arrays(evals: Iterable[Optional[PovScore]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per ply evals as white point of view arrays, stops at the first missing eval.
+    mate holds the sign of a forced mate (1 white mates, -1 black mates) and 0 when cp applies.
+    """
+    cps: List[int] = []
+    mates: List[int] = []
+    for current_eval in evals:
+        if not current_eval:
+            break
+        score = current_eval.pov(WHITE)
+        mate = score.mate()
+        if mate == 0:
+            # [%eval #0] is PovScore(Mate(0), turn): the side to move has been mated
+            mate = -1 if current_eval.turn == WHITE else 1
+        cps.append(0 if mate is not None else score.score() or 0)
+        mates.append(0 if mate is None else (1 if mate > 0 else -1))
+    return np.array(cps, dtype = np.int32), np.array(mates, dtype = np.int8)
+
+
+# comments, variation brackets, NAGs, move numbers, results, and everything else is a SAN move
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+TOKEN_REGEX = re.compile(r"\{[^}]*\}|[()]|\$\d+|\d+\.(?:\.\.)?|1-0|0-1|1/2-1/2|\*|[^\s{}()$]+")
+
+
+def parse_movetext(movetext: str, white_moves_first: bool = True) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Mainline SAN moves and eval_arrays() of a single movetext line, without building a game tree.
+    Variations are skipped, the first [%eval] comment after a move is its eval.
+    """
+    sans: List[str] = []
+    cps: List[int] = []
+    mates: List[int] = []
+    depth = 0
+    for token in TOKEN_REGEX.findall(movetext):
+        first = token[0]
+        if first == "(":
+            depth += 1
+        elif first == ")":
+            depth -= 1
+        elif depth:
+            continue
+        elif first == "{":
+            # only evals of consecutive plies count, like eval_arrays stopping at the first gap
+            if len(cps) != len(sans) - 1:
+                continue
+            match = EVAL_REGEX.search(token)
+            if not match:
+                continue
+            if match.group("mate"):
+                mate = int(match.group("mate"))
+                if mate == 0:
+                    # the side to move after the ply has been mated
+                    white_to_move = (len(sans) % 2 == 0) == white_moves_first
+                    mate = -1 if white_to_move else 1
+                cps.append(0)
+                mates.append(1 if mate > 0 else -1)
+            else:
+                cps.append(round(float(match.group("cp")) * 100))
+                mates.append(0)
+        elif first == "$" or token[-1] == "." or token in RESULTS:
+            continue
+        else:
+            san = token.rstrip("!?")
+            # castling written with zeros
+            sans.append(san.replace("0", "O") if first == "0" else san)
+    return sans, np.array(cps, dtype = np.int32), np.array(mates, dtype = np.int8)
+
+
+def boards_at(sans: Sequence[str], plies: Iterable[int], board: Optional[Board] = None) -> Dict[int, Board]:
+    """ Positions after the given plies, only replays moves up to the last one asked for """
+    board = board or Board()
+    wanted = set(int(ply) for ply in plies)
+    boards = {}
+    for ply, san in enumerate(sans[:max(wanted) + 1] if wanted else []):
+        board.push_san(san)
+        if ply in wanted:
+            boards[ply] = board.copy()
+    return boards
+
+
+def win_chances(cp: np.ndarray, mate: np.ndarray) -> np.ndarray:
+    """ Vectorized generator.win_chances, from -1 to 1 """
+    return np.where(mate != 0, mate, 2 / (1 + np.exp(MULTIPLIER * cp)) - 1)
+
+
+def turn_signs(plies: int, white_moves_first: bool = True) -> np.ndarray:
+    """ 1 where white is to move after the ply, -1 where black is """
+    signs = np.ones(plies, dtype = np.int8)
+    signs[0 if white_moves_first else 1::2] = -1
+    return signs
+
+
+def swings(cp: np.ndarray, mate: np.ndarray, white_moves_first: bool = True) -> np.ndarray:
+    """ Per ply gain in win chances of the side to move, what candidate_plies compares to the threshold """
+    signs = turn_signs(len(cp), white_moves_first)
+    chances = win_chances(cp, mate)
+    previous = np.empty(len(cp))
+    previous[1:] = signs[1:] * chances[:-1]
+    previous[:1] = INITIAL_WIN_CHANCES
+    return signs * chances - previous
+
+
+def candidate_plies(cp: np.ndarray, mate: np.ndarray, threshold: float, white_moves_first: bool = True) -> np.ndarray:
+    """
+    Indices of the plies where the side to move gained more than threshold win chances
+    compared to the previous eval, seen from the same side.
+    """
+    return candidate_plies_batch([(cp, mate)], threshold, [white_moves_first])[0]
+
+
+def candidate_plies_batch(games: Sequence[Tuple[np.ndarray, np.ndarray]], threshold: float,
+                          white_moves_first: Optional[Sequence[bool]] = None) -> List[np.ndarray]:
+    """ candidate_plies for many games at once, one concatenated pass over all evals """
+    if not games:
+        return []
+    lengths = np.array([len(cp) for cp, _ in games])
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    cp = np.concatenate([cp for cp, _ in games])
+    mate = np.concatenate([mate for _, mate in games])
+    firsts = white_moves_first or [True] * len(games)
+    signs = np.concatenate([turn_signs(n, first) for n, first in zip(lengths, firsts)])
+    chances = win_chances(cp, mate)
+    current = signs * chances
+    # the previous eval seen from the side to move now
+    previous = np.empty_like(current)
+    previous[1:] = signs[1:] * chances[:-1]
+    starts = offsets[:-1][lengths > 0]
+    previous[starts] = INITIAL_WIN_CHANCES
+    hits = np.flatnonzero(current > previous + threshold)
+    per_game = np.split(hits, np.searchsorted(hits, offsets[1:-1]))
+    return [game_hits - start for game_hits, start in zip(per_game, offsets[:-1])]
@@ -0,0 +1,91 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+from chess import Board, Color, PieceType, Square, BB_SQUARES, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from chess import BB_PAWN_ATTACKS, BB_KNIGHT_ATTACKS, BB_KING_ATTACKS
+from chess import BB_DIAG_ATTACKS, BB_DIAG_MASKS, BB_FILE_ATTACKS, BB_FILE_MASKS, BB_RANK_ATTACKS, BB_RANK_MASKS
+
+VALUES = {PAWN: 1, KNIGHT: 3, BISHOP: 3, ROOK: 5, QUEEN: 9, KING: 99}
+MEMO_SIZE = 1 << 16
+
+# pawns, knights, bishops, rooks, queens, kings, black pieces, white pieces
+Position = Tuple[int, int, int, int, int, int, int, int]
+
+
+def position(board: Board) -> Position:
+    return (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings, board.occupied_co[0], board.occupied_co[1])
+
+
+def _attackers(pos: Position, square: Square, occupied: int) -> int:
+    """ Pieces of both colors attacking square through occupied, without masking out captured ones """
+    pawns, knights, bishops, rooks, queens, kings, black, white = pos
+    diagonal = BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied]
+    straight = BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied] | BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied]
+    return (
+        (BB_PAWN_ATTACKS[0][square] & pawns & white)
+        | (BB_PAWN_ATTACKS[1][square] & pawns & black)
+        | (BB_KNIGHT_ATTACKS[square] & knights)
+        | (BB_KING_ATTACKS[square] & kings)
+        | (diagonal & (bishops | queens))
+        | (straight & (rooks | queens))
+    )
+
+
+@lru_cache(maxsize = MEMO_SIZE)
+def _exchange(pos: Position, square: Square, color: Color, target: int, occupied: int) -> int:
+    by_color = (pos[6], pos[7])
+    by_type = ((PAWN, pos[0]), (KNIGHT, pos[1]), (BISHOP, pos[2]), (ROOK, pos[3]), (QUEEN, pos[4]), (KING, pos[5]))
+    gains = []
+    captured = target
+    side = color
+    while True:
+        attackers = _attackers(pos, square, occupied) & occupied
+        ours = attackers & by_color[side]
+        if not ours:
+            break
+        for piece_type, mask in by_type:
+            if ours & mask:
+                break
+        # a king only takes when nothing can take it back
+        if piece_type == KING and attackers & by_color[not side]:
+            break
+        least = ours & mask
+        least &= -least
+        gains.append(captured)
+        captured = VALUES[piece_type]
+        occupied &= ~least
+        side = not side
+    score = 0
+    for gain in reversed(gains):
+        score = max(0, gain - score)
+    return score
+
+
+def see(board: Board, square: Square, color: Color, target: Optional[PieceType] = None, occupied: Optional[int] = None) -> int:
+    """
+    Material color wins, in pawns, by starting the captures on square, each side taking with its least
+    valuable attacker and free to stop, x-rays included; 0 when capturing doesn't pay.
+    target and occupied look at a piece that isn't on square yet: its type, and the occupancy without its origin.
+    Pins are ignored. Results are memoized per position.
+    """
+    if target is None:
+        target = board.piece_type_at(square)
+    value = VALUES[target] if target else 0
+    return _exchange(position(board), square, color, value, board.occupied if occupied is None else occupied)
+
+
+def is_hanging(board: Board, square: Square) -> bool:
+    """ The piece on square is lost whole: taking it costs its owner its full value """
+    piece = board.piece_at(square)
+    assert piece
+    return see(board, square, not piece.color) >= VALUES[piece.piece_type]
+
+
+def is_in_bad_spot(board: Board, square: Square) -> bool:
+    """ Capturing the piece on square wins material """
+    color = board.color_at(square)
+    assert color is not None
+    return see(board, square, not color) > 0
+
+
+def clear_memo() -> None:
+    _exchange.cache_clear()
@@ -0,0 +1,122 @@
+import calendar
+import json
+import logging
+import os
+import time
+import urllib.parse
+import urllib.request
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+from pgn_index import HEADER_REGEX
+
+logger = logging.getLogger(__name__)
+
+LICHESS_URL = "https://lichess.org"
+# write the state file every this many games, an interrupted sync repeats at most this many
+SAVE_EVERY = 100
+
+
+def game_timestamp(pgn: str) -> Optional[int]:
+    """ Milliseconds since the epoch of the UTCDate/UTCTime headers, Lichess' `since` unit """
+    headers = {key.decode(): value.decode() for key, value in HEADER_REGEX.findall(pgn.encode())}
+    date, clock = headers.get("UTCDate"), headers.get("UTCTime")
+    if not date or not clock or "?" in date:
+        return None
+    return calendar.timegm(time.strptime(f"{date} {clock}", "%Y.%m.%d %H:%M:%S")) * 1000
+
+
+def split_games(lines: Iterable[str]) -> Iterator[str]:
+    """ Games of a streamed PGN export, holding one game in memory at a time """
+    game: List[str] = []
+    has_moves = False
+    for line in lines:
+        if line.startswith("[Event ") and has_moves:
+            yield "".join(game).strip()
+            game = []
+            has_moves = False
+        elif line.strip() and not line.startswith("["):
+            has_moves = True
+        game.append(line)
+    if "".join(game).strip():
+        yield "".join(game).strip()
+
+
+class LichessSync:
+    """
+    Downloads only the games played since the last sync of each user, oldest first,
+    remembering the newest timestamp seen per user in a json state file.
+    base_url points at lichess.org or at a stand-in server.
+    """
+
+    def __init__(self, state_path: str, base_url: str = LICHESS_URL, token: Optional[str] = None, timeout: float = 60):
+        self.state_path = state_path
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.since: Dict[str, int] = {}
+        if os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.since = json.load(f)
+
+    def save(self) -> None:
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.since, f)
+        os.replace(tmp, self.state_path)
+
+    def request(self, username: str) -> urllib.request.Request:
+        params = {"evals": "true", "analysed": "true", "clocks": "false", "sort": "dateAsc"}
+        if username in self.since:
+            params["since"] = str(self.since[username])
+        url = f"{self.base_url}/api/games/user/{urllib.parse.quote(username)}?{urllib.parse.urlencode(params)}"
+        headers = {"Accept": "application/x-chess-pgn"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return urllib.request.Request(url, headers = headers)
+
+    def games(self, username: str, autosave: bool = True) -> Iterator[str]:
+        """
+        New games of a user as PGN texts, straight from the response stream.
+        With autosave the state is saved every SAVE_EVERY games and at the end,
+        without it the caller saves once the games it took are stored.
+        """
+        count = 0
+        try:
+            with urllib.request.urlopen(self.request(username), timeout = self.timeout) as response:
+                lines = (line.decode("utf-8") for line in response)
+                for pgn in split_games(lines):
+                    yield pgn
+                    # only advance once the consumer has taken the game
+                    timestamp = game_timestamp(pgn)
+                    if timestamp is not None and timestamp >= self.since.get(username, 0):
+                        # since is inclusive and compares milliseconds, the headers only have seconds
+                        self.since[username] = timestamp + 1000
+                    count += 1
+                    if autosave and count % SAVE_EVERY == 0:
+                        self.save()
+        finally:
+            if autosave:
+                self.save()
+            logger.info("Synced %d games of %s", count, username)
+
+    def sync_to_file(self, username: str, path: Optional[str] = None) -> int:
+        """
+        Appends new games to {username}_games.pgn, the file reference/download.py writes.
+        The state is only saved once the games before it are on disk, a crash can't skip them.
+        """
+        count = 0
+        with open(path or f"{username}_games.pgn", "a", encoding="utf-8") as f:
+            try:
+                for pgn in self.games(username, autosave = False):
+                    f.write(pgn + "\n\n\n")
+                    count += 1
+                    if count % SAVE_EVERY == 0:
+                        self.checkpoint(f)
+            finally:
+                self.checkpoint(f)
+        return count
+
+    def checkpoint(self, f: IO[str]) -> None:
+        f.flush()
+        os.fsync(f.fileno())
+        self.save()
@@ -0,0 +1,88 @@
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+import chess.syzygy
+from chess import Board, Move
+from chess.engine import Cp, Mate, Score
+
+# centipawns reported for a tablebase win, minus dtz so that faster conversions rank higher
+TB_WIN_CP = 10_000
+
+
+@dataclass
+class TablebaseMove:
+    move: Move
+    # from the point of view of the side playing the move
+    wdl: int
+    dtz: int
+    mate: bool = False
+
+    def score(self) -> Score:
+        if self.mate:
+            return Mate(1)
+        if self.wdl == 2:
+            return Cp(TB_WIN_CP - abs(self.dtz))
+        if self.wdl == -2:
+            return Cp(-TB_WIN_CP + abs(self.dtz))
+        # cursed wins and blessed losses are drawn under the 50 move rule
+        return Cp(0)
+
+
+@dataclass
+class TablebaseResult:
+    best: TablebaseMove
+    second: Optional[TablebaseMove]
+    # of the probed position, side to move point of view
+    wdl: int
+    dtz: int
+
+
+class Tablebase:
+    """
+    Local Syzygy tables, answers endgame positions exactly instead of searching them.
+    Every method degrades to "not covered" when no tables are present.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.tables: Optional[chess.syzygy.Tablebase] = None
+        self.max_pieces = 0
+        if path and os.path.isdir(path):
+            self.tables = chess.syzygy.open_tablebase(path)
+            # table names look like KQvKR, one letter per piece
+            self.max_pieces = max((len(name) - 1 for name in self.tables.wdl), default = 0)
+
+    def covers(self, board: Board) -> bool:
+        return (
+            self.tables is not None
+            and chess.popcount(board.occupied) <= self.max_pieces
+            and not board.castling_rights
+        )
+
+    def probe(self, board: Board) -> Optional[TablebaseResult]:
+        if not self.covers(board):
+            return None
+        assert self.tables
+        try:
+            wdl = self.tables.probe_wdl(board)
+            dtz = self.tables.probe_dtz(board)
+            moves: List[TablebaseMove] = []
+            for move in board.legal_moves:
+                board.push(move)
+                try:
+                    if board.is_checkmate():
+                        moves.append(TablebaseMove(move, 2, 0, True))
+                    else:
+                        moves.append(TablebaseMove(move, -self.tables.probe_wdl(board), -self.tables.probe_dtz(board)))
+                finally:
+                    board.pop()
+        except chess.syzygy.MissingTableError:
+            return None
+        if not moves:
+            return None
+        # mates first, then by outcome, winning fast and losing slow
+        moves.sort(key = lambda m: (m.mate, m.wdl, -abs(m.dtz) if m.wdl > 0 else abs(m.dtz)), reverse = True)
+        return TablebaseResult(moves[0], moves[1] if len(moves) > 1 else None, wdl, dtz)
+
+    def close(self) -> None:
+        if self.tables:
+            self.tables.close()
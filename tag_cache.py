@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from chess import Board, Move
+from chess.polyglot import zobrist_hash
+
+DEFAULT_SIZE = 100_000
+SAVE_EVERY = 100
+# tags that follow the puzzle's eval rather than its moves, never cached
+CP_TAGS = ("crushing", "advantage", "equality")
+
+# root position zobrist hash and the line's moves in uci
+Key = Tuple[int, str]
+
+
+def cache_key(board: Board, moves: Sequence[Move]) -> Key:
+    return zobrist_hash(board), " ".join(move.uci() for move in moves)
+
+
+def _signed(hash: int) -> int:
+    """ sqlite integers are signed 64 bit """
+    return hash - (1 << 64) if hash >= 1 << 63 else hash
+
+
+class TagCache:
+    """
+    Tags of already tagged lines by cache_key, so transpositions of a puzzle skip the detectors.
+    Keeps the size most recently used in memory; with db_path every entry is also kept in a
+    tag_cache table, e.g. of puzzles.db, and read back on a memory miss.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, size: int = DEFAULT_SIZE):
+        self.size = size
+        self.entries: "OrderedDict[Key, Tuple[str, ...]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread = False) if db_path else None
+        if self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tag_cache (
+                zobrist INTEGER,
+                moves TEXT,
+                tags TEXT,
+                PRIMARY KEY (zobrist, moves)
+            )
+            """)
+            self.conn.commit()
+
+    def _remember(self, key: Key, tags: Tuple[str, ...]) -> None:
+        self.entries[key] = tags
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last = False)
+
+    def get(self, key: Key) -> Optional[List[str]]:
+        with self.lock:
+            tags = self.entries.get(key)
+            if tags is not None:
+                self.entries.move_to_end(key)
+            elif self.conn:
+                row = self.conn.execute(
+                    "SELECT tags FROM tag_cache WHERE zobrist = ? AND moves = ?", (_signed(key[0]), key[1])
+                ).fetchone()
+                if row is not None:
+                    tags = tuple(row[0].split(",")) if row[0] else ()
+                    self._remember(key, tags)
+            if tags is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(tags)
+
+    def put(self, key: Key, tags: Sequence[str]) -> None:
+        stored = tuple(tag for tag in tags if tag not in CP_TAGS)
+        with self.lock:
+            self._remember(key, stored)
+            if self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO tag_cache (zobrist, moves, tags) VALUES (?, ?, ?)",
+                    (_signed(key[0]), key[1], ",".join(stored))
+                )
+                self.unsaved += 1
+                if self.unsaved >= SAVE_EVERY:
+                    self._save()
+
+    def _save(self) -> None:
+        if self.conn:
+            self.conn.commit()
+        self.unsaved = 0
+
+    def hit_rate(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def close(self) -> None:
+        with self.lock:
+            self._save()
+            if self.conn:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,78 @@
+import sqlite3
+from enum import IntFlag
+from typing import Dict, Iterable, List, Optional, Tuple, TypeVar, Union, get_args
+import numpy as np
+from reference.model import TagKind
+
+# bit i is the i-th TagKind, don't reorder the Literal without migrating stored masks
+TAGS: Tuple[str, ...] = get_args(TagKind)
+Tag = IntFlag("Tag", {name: 1 << i for i, name in enumerate(TAGS)})
+
+# a single mask or a numpy array of them, the bit ops below work on both
+Masks = TypeVar("Masks", int, np.ndarray)
+TagQuery = Union[int, Iterable[str]]
+
+
+def encode_tags(tags: Iterable[str]) -> int:
+    mask = 0
+    for tag in tags:
+        mask |= Tag[tag].value
+    return mask
+
+
+def decode_tags(mask: int) -> List[TagKind]:
+    return [tag for i, tag in enumerate(TAGS) if mask >> i & 1]  # type: ignore
+
+
+def _mask(query: TagQuery) -> int:
+    return query if isinstance(query, int) else encode_tags(query)
+
+
+def any_of(masks: Masks, query: TagQuery) -> Masks:
+    return masks & _mask(query) != 0
+
+
+def all_of(masks: Masks, query: TagQuery) -> Masks:
+    mask = _mask(query)
+    return masks & mask == mask
+
+
+def none_of(masks: Masks, query: TagQuery) -> Masks:
+    return masks & _mask(query) == 0
+
+
+def tag_counts(masks: np.ndarray) -> Dict[str, int]:
+    """ Puzzles per tag, one vectorized pass per bit """
+    masks = np.asarray(masks, dtype = np.uint64)
+    return {tag: int(np.count_nonzero(masks & np.uint64(1 << i))) for i, tag in enumerate(TAGS)}
+
+
+def sql_filter(any_tags: Optional[TagQuery] = None, all_tags: Optional[TagQuery] = None,
+               no_tags: Optional[TagQuery] = None, column: str = "tag_mask") -> Tuple[str, List[int]]:
+    """ WHERE clause and parameters selecting puzzles by their mask column """
+    clauses: List[str] = []
+    params: List[int] = []
+    if any_tags is not None:
+        clauses.append(f"({column} & ?) != 0")
+        params.append(_mask(any_tags))
+    if all_tags is not None:
+        clauses.append(f"({column} & ?) = ?")
+        params += [_mask(all_tags)] * 2
+    if no_tags is not None:
+        clauses.append(f"({column} & ?) = 0")
+        params.append(_mask(no_tags))
+    return " AND ".join(clauses) or "1", params
+
+
+def add_mask_column(conn: sqlite3.Connection, table: str = "puzzles") -> None:
+    """ Adds the tag_mask column to a database from before it existed, filled from the tags text """
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if "tag_mask" in columns:
+        return
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN tag_mask INTEGER NOT NULL DEFAULT 0")
+    rows = conn.execute(f"SELECT rowid, tags FROM {table}").fetchall()
+    conn.executemany(
+        f"UPDATE {table} SET tag_mask = ? WHERE rowid = ?",
+        [(encode_tags(filter(None, (tags or "").split(","))), rowid) for rowid, tags in rows]
+    )
+    conn.commit()
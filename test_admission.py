@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from chess.engine import Limit
+from admission import Admission, Tiers, load_admission
+from generator import Generator
+from pipeline import STOP, Stage
+from test_pipeline import FirstMoveEngine
+from test_screen import MOVETEXT
+
+def pgn(event: str, time_control: str, white_elo: int, black_elo: int) -> str:
+    return '[Event "{}"]\n[Site "https://lichess.org/{}"]\n[WhiteElo "{}"]\n[BlackElo "{}"]\n[TimeControl "{}"]\n\n{}\n'.format(
+        event, event, white_elo, black_elo, time_control, MOVETEXT)
+
+def site(event: str) -> str:
+    return '[Site "https://lichess.org/{}"]'.format(event)
+
+class LimitEngine(FirstMoveEngine):
+    """ FirstMoveEngine that also answers limited searches, recording the games and limits it saw """
+
+    def __init__(self):
+        super().__init__()
+        self.seen = []
+
+    def session(self, key):
+        self.key = key
+        return super().session(key)
+
+    def find_best_move(self, board):
+        self.seen.append((self.key, None))
+        return super().find_best_move(board)
+
+    def analyse(self, board, limit, multipv = None):
+        self.seen.append((self.key, limit))
+        return [{"pv": [super().find_best_move(board)]}]
+
+class TestAdmission(unittest.TestCase):
+
+    def test_tiers_from_headers(self) -> None:
+        tiers = Tiers.from_headers(['[WhiteElo "1800"]', '[BlackElo "1550"]', '[TimeControl "600+0"]'])
+        self.assertEqual(tiers, Tiers(3, 1))
+        self.assertEqual(tiers.budget_tier, 1)
+        self.assertEqual(Tiers.from_headers(['[Event "x"]']), Tiers(None, None))
+
+    def test_filter_and_limits(self) -> None:
+        limit = Limit(nodes = 1000)
+        admission = Admission(min_time_control = 1, limits = {1: limit})
+        self.assertFalse(admission.admit(Tiers(0, 3)))
+        self.assertTrue(admission.admit(Tiers(None, 0)))
+        self.assertEqual(admission.limit(Tiers(3, 1)), limit)
+        self.assertIsNone(admission.limit(Tiers(3, 3)))
+        self.assertGreater(admission.priority(Tiers(3, 3), 10, 10), admission.priority(Tiers(3, 3), 10, 5))
+        self.assertGreater(admission.priority(Tiers(3, 3), 10, 0), admission.priority(Tiers(3, 2), 10, 10))
+        self.assertFalse(Admission(min_eval_coverage = 0.9).covered(10, 5))
+
+    def test_generator_orders_and_budgets_games(self) -> None:
+        text = pgn("bullet", "30+0", 2000, 2000) + pgn("weak", "600+5", 1400, 1900) + pgn("strong", "600+5", 1900, 1900)
+        engine = LimitEngine()
+        limit = Limit(nodes = 1000)
+        gen = Generator(engine, admission = Admission(min_time_control = 1, limits = {0: limit}))
+        puzzles = gen.generate(text)
+        self.assertTrue(puzzles)
+        keys = [key for key, _ in engine.seen]
+        self.assertNotIn(site("bullet"), keys)
+        self.assertEqual(keys, sorted(keys, key = lambda key: key != site("strong")))
+        self.assertEqual({key: used for key, used in engine.seen}, {site("strong"): None, site("weak"): limit})
+
+    def test_load_admission(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "admission.yaml")
+            with open(path, "w") as f:
+                f.write("min_rating: 2\nlimits:\n  0: {nodes: 50000}\n  1: {depth: 18, time: 5}\n")
+            admission = load_admission(path)
+        self.assertEqual(admission.min_rating, 2)
+        self.assertEqual(admission.limits, {0: Limit(nodes = 50000), 1: Limit(depth = 18, time = 5)})
+
+    def test_priority_stage(self) -> None:
+        stage = Stage("analyse", lambda n: [n], 1, 10, priority = lambda n: (n,))
+        stage.put(1)
+        stage.put(STOP)
+        for n in [5, 3, 5]:
+            stage.put(n)
+        self.assertEqual([stage.get() for _ in range(5)], [5, 5, 3, 1, STOP])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,9 +7,10 @@ class TestDetection(unittest.TestCase):
        fen = "rn1qkb1r/ppp2ppp/5n2/4p3/2B1P3/5Q2/PPP2PPP/RNB1K2R w KQkq - 2 7"
        self.assertTrue(fork(fen, 'f3b3'), f"Expected fork for {fen}")
 
-   #  def test_pin(self) -> None:
-   #     fen = "r2q1rk1/pppn1pp1/5n1p/4p1B1/2B1P3/2Q5/PPP2PPP/3R1RK1 w - - 0 12"
-   #     self.assertTrue(pin(fen, 'g5f6'), f"Expected pin for {fen}")
+    def test_pin(self) -> None:
+       # the knight on d7 is pinned to its queen and can't take back on f6
+       fen = "r2q1rk1/pppn1pp1/5n1p/4p1B1/2B1P3/2Q5/PPP2PPP/3R1RK1 w - - 0 12"
+       self.assertTrue(pin(fen, 'g5f6'), f"Expected pin for {fen}")
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from chess import Board
+from classifier import FEATURE_NAMES, FULL, SHALLOW, SKIP, CandidateLog, LogisticRegression, PuzzleGate, benchmark, cheap_features, precision_recall, threshold_for_recall
+from generator import Generator
+from tags import encode_tags
+from test_pipeline import FirstMoveEngine
+from test_screen import MOVETEXT
+
+class ConstantModel:
+    """ predicts the same puzzle probability for every candidate """
+
+    def __init__(self, probability: float):
+        self.probability = probability
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        return np.tile([1 - self.probability, self.probability], (len(x), 1))
+
+class TestClassifier(unittest.TestCase):
+
+    def test_cheap_features(self) -> None:
+        # black to move, the white queen on h5 hangs to nothing but the f7 pawn is attacked twice
+        board = Board("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 3 3")
+        row = dict(zip(FEATURE_NAMES, cheap_features([board], [0.4])[0]))
+        self.assertAlmostEqual(row["swing"], 0.4, places = 5)
+        self.assertEqual(row["material"], 78)
+        self.assertEqual(row["material_balance"], 0)
+        self.assertEqual(row["legal_moves"], len(list(board.legal_moves)))
+        self.assertEqual(row["captures"], 2)
+        self.assertEqual(row["hanging_theirs"], 2)
+
+    def test_thresholds_and_benchmark(self) -> None:
+        probabilities = np.array([0.05, 0.1, 0.3, 0.6, 0.8, 0.9])
+        labels = np.array([0, 0, 1, 0, 1, 1])
+        self.assertEqual(threshold_for_recall(probabilities, labels, 1.0), 0.3)
+        self.assertEqual(threshold_for_recall(probabilities, labels, 0.6), 0.8)
+        self.assertEqual(precision_recall(probabilities, labels, 0.3), (0.75, 1.0))
+        [row] = benchmark(probabilities, labels, np.array([1, 1, 1, 1, 2, 4]), thresholds = [0.7])
+        self.assertEqual(row["engine_time_saved"], 0.4)
+        self.assertAlmostEqual(row["puzzles_lost"], 1 / 3)
+
+    def test_gate_in_generator(self) -> None:
+        engine = FirstMoveEngine()
+        self.assertEqual(Generator(engine, gate = PuzzleGate(ConstantModel(0.01), 0.1, 0.5)).generate(MOVETEXT), [])
+        self.assertEqual(engine.calls, 0)
+        self.assertEqual(PuzzleGate(ConstantModel(0.3), 0.1, 0.5).decide(Board(), 0.3), SHALLOW)
+        self.assertEqual(PuzzleGate(ConstantModel(0.6), 0.1, 0.5).decide(Board(), 0.3), FULL)
+
+    def test_candidate_log(self) -> None:
+        log = CandidateLog(os.path.join(tempfile.mkdtemp(), "puzzles.db"))
+        board = Board("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 3 3")
+        log.record(board, 0.4, True, encode_tags(["crushing", "fork"]), 2.5)
+        log.record(Board(), 0.3, False, 0, 1.0)
+        x, labels, masks, seconds = log.load()
+        self.assertEqual(x.shape, (2, len(FEATURE_NAMES)))
+        self.assertEqual(list(x[0]), list(cheap_features([board], [0.4])[0]))
+        self.assertEqual(list(labels), [1, 0])
+        self.assertEqual(list(masks), [encode_tags(["crushing", "fork"]), 0])
+        self.assertEqual(list(seconds), [2.5, 1.0])
+        log.close()
+
+    @unittest.skipIf(LogisticRegression is None, "scikit-learn isn't installed")
+    def test_train(self) -> None:
+        rng = np.random.default_rng(0)
+        x = rng.normal(size = (400, len(FEATURE_NAMES))).astype(np.float32)
+        labels = (x[:, 0] > 0.5).astype(np.int8)
+        gate = PuzzleGate.train(x, labels)
+        self.assertLessEqual(gate.skip_below, gate.full_from)
+        _, recall = precision_recall(gate.probabilities(x), labels, gate.skip_below)
+        self.assertGreaterEqual(recall, 0.99)
+
+if __name__ == '__main__':
+    unittest.main()
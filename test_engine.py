@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import unittest
+from unittest import mock
+from engine import Engine, EnginePool, available_memory_mb, hash_size_mb
+from generator import Generator
+
+def affinity_after(preexec_fn, cpus) -> None:
+    preexec_fn()
+    cpus.extend(sorted(os.sched_getaffinity(0)))
+
+class TestEngine(unittest.TestCase):
+
+    def test_hash_size_is_split_between_engines(self) -> None:
+        with mock.patch("engine.available_memory_mb", return_value = 16_000):
+            self.assertEqual(hash_size_mb(), 4096)
+            self.assertEqual(hash_size_mb(4), 1024)
+            self.assertEqual(hash_size_mb(1000), 16)
+
+    def test_available_memory_is_capped_by_cgroup(self) -> None:
+        with mock.patch("engine.cgroup_limit_mb", return_value = 1):
+            self.assertEqual(available_memory_mb(), 1)
+        with mock.patch("engine.cgroup_limit_mb", return_value = None):
+            self.assertGreater(available_memory_mb(), 1)
+
+    def test_session_key_routes_to_same_engine(self) -> None:
+        pool = EnginePool([object(), object(), object()])
+        site = '[Site "https://lichess.org/0YiOyDOR"]'
+        self.assertIs(pool.route(site), pool.route(site))
+
+    def test_games_of_one_event_get_their_own_keys(self) -> None:
+        event = '[Event "Rated blitz game"]\n'
+        pgn = "".join(event + header + "\n\n1. e4 { [%eval 0.18] } 1... e5 { [%eval 0.21] }\n" for header in [
+            '[Site "https://lichess.org/aaaa1111"]', '[GameId "bbbb2222"]', '[Round "-"]', '[Round "-"]',
+        ])
+        keys = [game.key for game in Generator(None).games(pgn)]
+        self.assertEqual(keys[:2], ['[Site "https://lichess.org/aaaa1111"]', '[GameId "bbbb2222"]'])
+        self.assertEqual(len(set(keys)), 4)
+        pool = EnginePool([object() for _ in range(4)])
+        self.assertGreater(len({id(pool.route(key)) for key in keys}), 1)
+
+    def test_engine_starts_pinned_before_threads_are_set(self) -> None:
+        with mock.patch("engine.SimpleEngine.popen_uci") as popen_uci:
+            Engine("stockfish", threads = 4, hash_mb = 16, cpus = [0])
+        preexec_fn = popen_uci.call_args.kwargs["preexec_fn"]
+        self.assertEqual(popen_uci.return_value.configure.call_args.args[0]["Threads"], 4)
+        # run in a child, the way subprocess does between fork and exec
+        cpus = multiprocessing.Manager().list()
+        child = multiprocessing.get_context("fork").Process(target = affinity_after, args = (preexec_fn, cpus))
+        child.start()
+        child.join()
+        self.assertEqual(list(cpus), [0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import unittest
+import chess
+from chess import Board, Move
+from chess.pgn import Game
+from export import PuzzleArchive, database_records, decode_board, decode_move, encode_board, encode_move, unpack_boards, write_puzzles
+
+FENS = [
+    "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w Kq f6 0 3",
+    "8/P7/8/8/8/8/6k1/4K3 w - - 0 60",
+]
+
+class TestExport(unittest.TestCase):
+
+    def test_board_round_trip(self) -> None:
+        for fen in FENS:
+            board = Board(fen)
+            self.assertEqual(decode_board(encode_board(board)).epd(), board.epd())
+
+    def test_move_round_trip(self) -> None:
+        for uci in ["h5f7", "e5f6", "a7a8q", "a7a8n", "e1g1"]:
+            move = Move.from_uci(uci)
+            self.assertEqual(decode_move(encode_move(move)), move)
+
+    def test_archive(self) -> None:
+        path = os.path.join(tempfile.mkdtemp(), "puzzles.bin")
+        records = [
+            (Board(FENS[0]), [Move.from_uci("h5f7")], 999999999, ["mate", "mateIn1", "oneMove"]),
+            (Board(FENS[2]), [Move.from_uci("a7a8q"), Move.from_uci("g2f3")], -412, ["promotion", "zugzwang"]),
+        ]
+        self.assertEqual(write_puzzles(path, records), 2)
+        archive = PuzzleArchive(path)
+        self.assertEqual(len(archive), 2)
+        self.assertEqual(list(archive.cp), [32767, -412])
+        self.assertEqual(list(archive.lengths), [1, 2])
+        board, moves, cp, tags = archive[1]
+        self.assertEqual(board.epd(), Board(FENS[2]).epd())
+        self.assertEqual(moves, records[1][1])
+        self.assertEqual(cp, -412)
+        self.assertEqual(tags, ["promotion", "zugzwang"])
+        squares = unpack_boards(archive.boards)
+        self.assertEqual(squares.shape, (2, 64))
+        self.assertEqual(squares[1, chess.A7], chess.PAWN)
+        self.assertEqual(squares[1, chess.G2], chess.KING | 8)
+        archive.close()
+
+    def test_too_long_solution(self) -> None:
+        path = os.path.join(tempfile.mkdtemp(), "puzzles.bin")
+        with self.assertRaises(ValueError):
+            write_puzzles(path, [(Board(), [Move.from_uci("e2e4")] * 3, 0, [])], max_moves = 2)
+
+    def test_database_records(self) -> None:
+        db = os.path.join(tempfile.mkdtemp(), "puzzles.db")
+        conn = sqlite3.connect(db)
+        conn.execute("CREATE TABLE puzzles (id INTEGER PRIMARY KEY AUTOINCREMENT, moves BLOB, cp INTEGER, tags TEXT, game BLOB)")
+        game = Game.from_board(Board(FENS[0]))
+        conn.execute("INSERT INTO puzzles (moves, cp, tags, game) VALUES (?, ?, ?, ?)",
+                     (pickle.dumps([Move.from_uci("h5f7")]), 999999999, "mate,mateIn1", pickle.dumps(game)))
+        conn.commit()
+        conn.close()
+        [(board, moves, cp, tags)] = database_records(db)
+        self.assertEqual(board.epd(), Board(FENS[0]).epd())
+        self.assertEqual(list(tags), ["mate", "mateIn1"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import random
+import tempfile
+import unittest
+import chess
+import numpy as np
+from chess import Board, Move
+from export import PuzzleArchive, encode_board, unpack_boards, write_puzzles
+from features import attack_maps, bitboards_from_boards, bitboards_from_codes, channels, archive_chunks, record_chunks, write_shards
+
+def random_boards(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    boards = []
+    board = Board()
+    while len(boards) < n:
+        moves = list(board.legal_moves)
+        if not moves or board.ply() > 120:
+            board = Board()
+            continue
+        board.push(rng.choice(moves))
+        boards.append(board.copy(stack = False))
+    return boards
+
+class TestFeatures(unittest.TestCase):
+
+    def test_bitboards_from_codes(self) -> None:
+        boards = random_boards(50)
+        codes = unpack_boards(np.frombuffer(b"".join(encode_board(b) for b in boards), dtype = np.uint8).reshape(50, -1))
+        self.assertTrue(np.array_equal(bitboards_from_codes(codes), bitboards_from_boards(boards)))
+
+    def test_attack_maps(self) -> None:
+        boards = random_boards(300)
+        maps = attack_maps(bitboards_from_boards(boards))
+        for board, (white, black) in zip(boards, maps):
+            for color, attacks in ((chess.WHITE, white), (chess.BLACK, black)):
+                expected = 0
+                for square in chess.SquareSet(board.occupied_co[color]):
+                    expected |= board.attacks_mask(square)
+                self.assertEqual(int(attacks), expected, board.fen())
+
+    def test_chunks_and_shards(self) -> None:
+        boards = random_boards(5)
+        records = [(board, [next(iter(board.legal_moves))], 100, ["fork"]) for board in boards]
+        out = tempfile.mkdtemp()
+        archive_path = os.path.join(out, "puzzles.bin")
+        write_puzzles(archive_path, records)
+        archive = PuzzleArchive(archive_path)
+        from_archive = list(archive_chunks(archive, chunk_size = 2))
+        archive.close()
+        from_records = list(record_chunks(records, chunk_size = 2))
+        self.assertEqual([len(x) for x, _ in from_archive], [2, 2, 1])
+        for (x1, tags1), (x2, tags2) in zip(from_archive, from_records):
+            self.assertTrue(np.array_equal(x1, x2))
+            self.assertTrue(np.array_equal(tags1, tags2))
+        x, _ = from_archive[0]
+        self.assertEqual(x.shape, (2, channels(), 8, 8))
+        move = records[0][1][0]
+        self.assertEqual(x[0, 14].reshape(64)[move.from_square], 1)
+        self.assertEqual(x[0, 15].reshape(64)[move.to_square], 1)
+        self.assertEqual(x[0, 16:].sum(), 0)
+        paths = write_shards(from_archive, os.path.join(out, "shards"))
+        self.assertEqual(len(paths), 3)
+        shard = np.load(paths[2], mmap_mode = "r")
+        self.assertTrue(np.array_equal(shard, from_archive[2][0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+import chess
+from chess import SquareSet, BLACK, WHITE
+from geometry import BACK_RANK_ESCAPE, BETWEEN, CORNER_DISTANCE, DISTANCE, KING_ZONE, PAWN_SHIELD
+
+class TestGeometry(unittest.TestCase):
+
+    def test_king_tables(self) -> None:
+        for king in chess.SQUARES:
+            near = SquareSet(s for s in chess.SQUARES if chess.square_distance(s, king) < 2)
+            self.assertEqual(SquareSet(KING_ZONE[king]), near)
+        self.assertEqual(SquareSet(PAWN_SHIELD[BLACK][chess.G8]), SquareSet([chess.F8, chess.H8, chess.F7, chess.G7, chess.H7]))
+        self.assertEqual(SquareSet(PAWN_SHIELD[WHITE][chess.A1]), SquareSet([chess.B1, chess.A2, chess.B2]))
+        self.assertEqual(SquareSet(BACK_RANK_ESCAPE[WHITE][chess.G1]), SquareSet([chess.F2, chess.G2, chess.H2]))
+        self.assertEqual(BACK_RANK_ESCAPE[WHITE][chess.G2], 0)
+        self.assertEqual(BACK_RANK_ESCAPE[BLACK][chess.G1], 0)
+
+    def test_distances_and_lines(self) -> None:
+        self.assertEqual(DISTANCE[chess.A1][chess.H8], 7)
+        self.assertEqual(CORNER_DISTANCE[chess.E4], 3)
+        self.assertEqual(SquareSet(BETWEEN[chess.A1][chess.D4]), SquareSet([chess.B2, chess.C3]))
+        self.assertEqual(BETWEEN[chess.A1][chess.B3], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from chess import Board, Move
+from mate_in_one import gives_check, mating_moves, non_mating_moves
+
+def brute_force(board: Board) -> list:
+    """ the push, is_checkmate, pop loop count_mates used to run """
+    mates = []
+    for move in list(board.legal_moves):
+        board.push(move)
+        if board.is_checkmate():
+            mates.append(move)
+        board.pop()
+    return mates
+
+class TestMateInOne(unittest.TestCase):
+
+    def test_mates(self) -> None:
+        for fen, expected in [
+            # back rank, two rooks mate on two squares
+            ("6k1/5ppp/8/8/8/8/8/RR4K1 w - - 0 1", {"a1a8", "b1b8"}),
+            # smothered
+            ("6rk/6pp/8/6N1/8/8/8/6K1 w - - 0 1", {"g5f7"}),
+            # the king and pawn box the king in, rook and bishop both mate
+            ("1k6/1P6/1K6/8/8/8/8/4B2R w - - 0 1", {"h1h8", "e1g3"}),
+            ("4k3/8/8/8/8/8/8/4K3 w - - 0 1", set()),
+        ]:
+            board = Board(fen)
+            self.assertEqual({move.uci() for move in mating_moves(board)}, expected, fen)
+            self.assertEqual(set(mating_moves(board)), set(brute_force(board)), fen)
+            self.assertEqual(board.fen(), fen)
+
+    def test_non_mating_moves(self) -> None:
+        board = Board("6k1/5ppp/8/8/8/8/8/RR4K1 w - - 0 1")
+        others = non_mating_moves(board)
+        self.assertEqual(len(others) + 2, board.legal_moves.count())
+        self.assertNotIn(Move.from_uci("a1a8"), others)
+
+    def test_gives_check(self) -> None:
+        for fen in [
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+            "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+            "4k3/8/8/3pP3/8/8/8/4K2R w K d6 0 1",
+        ]:
+            board = Board(fen)
+            king = board.king(not board.turn)
+            assert king is not None
+            for move in board.legal_moves:
+                self.assertEqual(gives_check(board, move, king), board.gives_check(move), f"{fen} {move}")
+
+if __name__ == '__main__':
+    unittest.main()
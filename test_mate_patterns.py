@@ -0,0 +1,29 @@
+import unittest
+from chess import Board, Move, WHITE
+from mate_patterns import MatePosition, mate_pattern
+
+def final(fen: str, uci: str) -> Board:
+    board = Board(fen)
+    board.push_uci(uci)
+    return board
+
+class TestMatePatterns(unittest.TestCase):
+
+    def test_patterns(self) -> None:
+        cases = [
+            ("6rk/6pp/8/4N3/8/8/8/6K1 w - - 0 1", "e5f7", "smotheredMate"),
+            ("6k1/5ppp/8/8/8/8/8/3R2K1 w - - 0 1", "d1d8", "backRankMate"),
+            ("8/4N1pk/8/3R4/8/8/8/6K1 w - - 0 1", "d5h5", "anastasiaMate"),
+            ("5k2/5pN1/7P/8/8/8/8/4R1K1 w - - 0 1", "e1e8", "hookMate"),
+            ("6k1/8/8/8/8/8/8/4R1K1 w - - 0 1", "e1e2", None),
+        ]
+        for fen, uci, expected in cases:
+            board = final(fen, uci)
+            self.assertEqual(mate_pattern(board, Move.from_uci(uci), WHITE), expected, fen)
+
+    def test_smothered_needs_every_escape_blocked(self) -> None:
+        board = final("7k/6pp/8/4N3/8/8/8/6K1 w - - 0 1", "e5f7")
+        self.assertFalse(MatePosition(board, Move.from_uci("e5f7"), WHITE).smothered())
+
+if __name__ == '__main__':
+    unittest.main()
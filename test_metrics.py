@@ -0,0 +1,51 @@
+import multiprocessing
+import unittest
+from chess.engine import Limit
+from metrics import EngineMetrics, RingBuffer, engine_metrics
+
+def observe_in_child(metrics: EngineMetrics) -> None:
+    metrics.observe({"nps": 3000, "nodes": 100, "time": 0.1, "depth": 10}, Limit(nodes = 100))
+
+class TestMetrics(unittest.TestCase):
+
+    def test_ring_buffer_overwrites_oldest(self) -> None:
+        buffer = RingBuffer(3)
+        for value in [10, 1, 2, 3]:
+            buffer.append(value)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.mean(), 2)
+
+    def test_limit_classification(self) -> None:
+        metrics = EngineMetrics()
+        limit = Limit(depth = 20, time = 10, nodes = 1_000_000)
+        metrics.observe({"nps": 2_000_000, "nodes": 1_000_000, "time": 0.5, "depth": 18, "hashfull": 500}, limit)
+        metrics.observe({"nps": 1_000_000, "nodes": 900_000, "time": 10.0, "depth": 17}, limit)
+        metrics.observe({"nps": 3_000_000, "nodes": 10_000, "time": 0.01, "depth": 20}, limit)
+        summary = metrics.summary()
+        self.assertEqual(summary["analyses"], 3)
+        self.assertEqual(summary["avg_knps"], 2000)
+        self.assertEqual(summary["node_limited"], 1)
+        self.assertEqual(summary["time_limited"], 1)
+        self.assertEqual(summary["avg_hashfull_percent"], 50)
+
+    def test_shared_with_forked_process(self) -> None:
+        metrics = EngineMetrics()
+        process = multiprocessing.get_context("fork").Process(target = observe_in_child, args = (metrics,))
+        process.start()
+        process.join()
+        self.assertEqual(metrics.summary()["node_limited"], 1)
+        self.assertEqual(metrics.avg_knps(), 3)
+
+    def test_each_engine_has_its_own_metrics(self) -> None:
+        class Stub:
+            pass
+        small, large = Stub(), Stub()
+        engine_metrics(small).observe({"nps": 1000})
+        for _ in range(2):
+            engine_metrics(large).observe({"nps": 9000})
+        self.assertEqual(engine_metrics(small).avg_knps(), 1)
+        self.assertEqual(engine_metrics(large).avg_knps(), 9)
+        self.assertEqual(engine_metrics(large).summary()["analyses"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
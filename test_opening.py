@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+from chess import Board, Move
+from opening import OpeningIndex
+
+class TestOpening(unittest.TestCase):
+
+    def test_remembered_analysis_survives_save(self) -> None:
+        path = os.path.join(tempfile.mkdtemp(), "openings.json")
+        board = Board()
+        board.push_san("e4")
+        index = OpeningIndex(store_path = path)
+        index.remember(board, Move.from_uci("c7c5"))
+        index.close()
+        # same position through another move order
+        transposed = Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+        self.assertEqual(OpeningIndex(store_path = path).lookup(transposed), Move.from_uci("c7c5"))
+
+    def test_deep_positions_are_not_indexed(self) -> None:
+        index = OpeningIndex(max_ply = 2)
+        board = Board()
+        for san in ["e4", "e5", "Nf3"]:
+            board.push_san(san)
+        index.remember(board, Move.from_uci("b8c6"))
+        self.assertEqual(index.analysed, {})
+        self.assertFalse(index.in_book(board))
+
+if __name__ == '__main__':
+    unittest.main()
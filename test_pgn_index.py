@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from pgn_index import PgnArchive
+
+def game(game_id: str, white: str, black: str, elo: int, date: str) -> str:
+    return f"""[Event "Rated blitz game"]
+[Site "https://lichess.org/{game_id}"]
+[Date "{date}"]
+[White "{white}"]
+[Black "{black}"]
+[WhiteElo "{elo}"]
+[BlackElo "{elo + 50}"]
+[UTCDate "{date}"]
+[GameId "{game_id}"]
+
+1. e4 {{ [%eval 0.18] }} 1... e5 {{ [%eval 0.21] }} 1-0
+
+
+"""
+
+class TestPgnIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "kramford_games.pgn")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(game("aaaa1111", "kramford", "jishnukp", 1500, "2025.02.01"))
+            f.write(game("bbbb2222", "jishnukp", "someone", 1800, "2025.02.02"))
+            f.write(game("cccc3333", "kramford", "someone", 1400, "2025.02.03"))
+
+    def test_random_access_and_filters(self) -> None:
+        archive = PgnArchive(self.path)
+        self.assertEqual(len(archive), 3)
+        text = archive.game("bbbb2222")
+        assert text
+        self.assertTrue(text.startswith('[Event "Rated blitz game"]'))
+        self.assertIn('[GameId "bbbb2222"]', text)
+        self.assertTrue(text.endswith("1-0"))
+        self.assertIsNone(archive.game("missing"))
+        self.assertEqual(len(list(archive.select(user = "kramford"))), 2)
+        self.assertEqual(len(list(archive.select(since = "2025.02.02"))), 2)
+        self.assertEqual(len(list(archive.select(min_elo = 1600))), 1)
+        shards = [list(archive.select(shard = (i, 2))) for i in range(2)]
+        self.assertEqual(sorted(shards[0] + shards[1]), sorted(archive.select()))
+        archive.close()
+
+    def test_appended_games_are_indexed_incrementally(self) -> None:
+        PgnArchive(self.path).close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(game("dddd4444", "kramford", "jishnukp", 1600, "2025.02.04"))
+        archive = PgnArchive(self.path)
+        self.assertEqual(len(archive), 4)
+        self.assertIn("dddd4444", archive.game("dddd4444") or "")
+        self.assertNotIn("dddd4444", archive.game("cccc3333") or "")
+        archive.close()
+
+    def test_rewritten_larger_file_is_reindexed(self) -> None:
+        PgnArchive(self.path).close()
+        # a newest-first export rewritten in place: new game on top, everything else shifted
+        with open(self.path, encoding="utf-8") as f:
+            old = f.read()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(game("eeee5555", "kramford", "jishnukp", 1700, "2025.02.05") + old)
+        archive = PgnArchive(self.path)
+        self.assertEqual(len(archive), 4)
+        for game_id in ["aaaa1111", "bbbb2222", "cccc3333", "eeee5555"]:
+            self.assertIn(f'[GameId "{game_id}"]', archive.game(game_id) or "")
+        archive.close()
+
+    def test_shards_are_stable_across_reindexing(self) -> None:
+        archive = PgnArchive(self.path)
+        before = [set(archive.select(shard = (i, 2))) for i in range(2)]
+        archive.close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(game("dddd4444", "kramford", "jishnukp", 1600, "2025.02.04"))
+        archive = PgnArchive(self.path)
+        after = [set(archive.select(shard = (i, 2))) for i in range(2)]
+        archive.close()
+        self.assertTrue(all(old <= new for old, new in zip(before, after)))
+        self.assertEqual(sum(len(shard) for shard in after), 4)
+
+if __name__ == '__main__':
+    unittest.main()
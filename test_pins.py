@@ -0,0 +1,39 @@
+import unittest
+from chess import Board, WHITE, BLACK, BB_ALL, KNIGHT, QUEEN, COLORS, SquareSet, parse_square
+from pins import lines, pins, skewers
+
+class TestPins(unittest.TestCase):
+
+    def test_absolute_pins_match_board_pin(self) -> None:
+        board = Board("r2q1rk1/pppn1pp1/5n1p/4p3/2B1P1b1/2Q2N2/PPP2PPP/3R1RK1 w - - 0 12")
+        for color in COLORS:
+            found = pins(board, color)
+            for square in SquareSet(board.occupied_co[color]):
+                pin = found.get(square)
+                expected = board.pin(color, square)
+                self.assertEqual(pin.ray if pin and pin.absolute else SquareSet(BB_ALL), expected)
+
+    def test_relative_pin(self) -> None:
+        board = Board("r2q1rk1/pppn1pp1/5B1p/4p3/2B1P3/2Q5/PPP2PPP/3R1RK1 b - - 0 12")
+        found = pins(board, BLACK)
+        pin = found[parse_square("d7")]
+        self.assertFalse(pin.absolute)
+        self.assertEqual((pin.slider, pin.behind), (parse_square("d1"), parse_square("d8")))
+        self.assertEqual((pin.front_type, pin.behind_type), (KNIGHT, QUEEN))
+        self.assertIn(parse_square("f7"), found)
+        self.assertTrue(found[parse_square("f7")].absolute)
+        self.assertEqual(pins(board, WHITE), {})
+
+    def test_skewer(self) -> None:
+        board = Board("8/8/1k6/8/3q4/8/5B2/6K1 w - - 0 1")
+        self.assertEqual([(l.front, l.behind) for l in lines(board, WHITE)], [(parse_square("d4"), parse_square("b6"))])
+        self.assertEqual(skewers(board, WHITE), ())
+        self.assertTrue(pins(board, BLACK)[parse_square("d4")].absolute)
+        board = Board("8/6k1/8/4q3/8/8/1B6/6K1 w - - 0 1")
+        self.assertEqual(skewers(board, WHITE), ())
+        board = Board("8/6r1/8/4q3/8/8/1B6/6K1 w - - 0 1")
+        self.assertEqual([(l.front, l.behind) for l in skewers(board, WHITE)], [(parse_square("e5"), parse_square("g7"))])
+        self.assertEqual(pins(board, BLACK), {})
+
+if __name__ == '__main__':
+    unittest.main()
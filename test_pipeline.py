@@ -0,0 +1,70 @@
+import threading
+import unittest
+from contextlib import contextmanager
+from engine import EnginePool
+from generator import Generator
+from pipeline import Pipeline, Stage, puzzle_pipeline
+from test_screen import MOVETEXT
+
+class FirstMoveEngine:
+    """ stands in for stockfish: plays the first legal move """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    @contextmanager
+    def session(self, key):
+        with self.lock:
+            yield self
+
+    def find_best_move(self, board):
+        self.calls += 1
+        return next(iter(board.legal_moves))
+
+class TestPipeline(unittest.TestCase):
+
+    def test_stages_run_to_completion(self) -> None:
+        results = []
+        pipeline = Pipeline([
+            Stage("split", lambda text: text.split(), 1, 2),
+            Stage("double", lambda word: [word * 2], 3, 2),
+            Stage("collect", results.append, 1, 2),
+        ])
+        pipeline.run(["a b c", "d e"])
+        self.assertEqual(sorted(results), ["aa", "bb", "cc", "dd", "ee"])
+        stats = pipeline.stats()
+        self.assertEqual(stats["split"]["emitted"], 5)
+        self.assertEqual(stats["double"]["received"], 5)
+        self.assertEqual(stats["collect"]["queue_depth"], 0)
+
+    def test_failures_are_counted_not_fatal(self) -> None:
+        pipeline = Pipeline([Stage("parse", lambda text: [int(text)])])
+        pipeline.run(["1", "x", "3"])
+        self.assertEqual(pipeline.stats()["parse"]["failed"], 1)
+        self.assertEqual(pipeline.stats()["parse"]["emitted"], 2)
+
+    def test_puzzle_pipeline_matches_generate(self) -> None:
+        pgn = '[Event "Rated rapid game"]\n\n{}\n'.format(MOVETEXT)
+        engine = FirstMoveEngine()
+        gen = Generator(engine)
+        expected = [p.node.board().fen() for p in gen.generate(pgn)]
+        stored = []
+        pipeline = puzzle_pipeline(gen, stored.append, analysers = 2)
+        pipeline.run([pgn, pgn])
+        self.assertTrue(expected)
+        self.assertEqual(sorted(p.node.board().fen() for p in stored), sorted(expected * 2))
+        self.assertEqual(pipeline.stats()["analyse"]["received"], 2 * len(expected))
+
+    def test_analysers_spread_games_over_a_pool(self) -> None:
+        pgn = "".join('[Event "Rated rapid game"]\n[Site "https://lichess.org/{}"]\n\n{}\n'.format(game_id, MOVETEXT)
+                      for game_id in ["aaaa1111", "bbbb2222"])
+        engines = [FirstMoveEngine(), FirstMoveEngine()]
+        stored = []
+        pipeline = puzzle_pipeline(Generator(EnginePool(engines)), stored.append, analysers = 2)
+        pipeline.run([pgn])
+        self.assertTrue(all(engine.calls for engine in engines))
+        self.assertEqual(sum(engine.calls for engine in engines), len(stored))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import unittest
+from profiler import Profiler, profiled, profiler
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self) -> None:
+        profiler.reset()
+        profiler.enabled = True
+
+    def tearDown(self) -> None:
+        profiler.enabled = False
+        profiler.reset()
+
+    def test_counts_and_hit_rate(self) -> None:
+        @profiled
+        def detector(hit: bool) -> bool:
+            return hit
+        for hit in [True, False, False, True]:
+            detector(hit)
+        stats = profiler.to_dict()["detector"]
+        self.assertEqual(stats["calls"], 4)
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertEqual(sum(stats["buckets"].values()), 4)
+
+    def test_failed_calls_are_timed(self) -> None:
+        @profiled
+        def engine_call(fail: bool) -> bool:
+            if fail:
+                raise TimeoutError()
+            return True
+        engine_call(False)
+        with self.assertRaises(TimeoutError):
+            engine_call(True)
+        stats = profiler.to_dict()["engine_call"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_disabled_records_nothing(self) -> None:
+        profiler.enabled = False
+        @profiled
+        def detector() -> bool:
+            return True
+        self.assertTrue(detector())
+        self.assertEqual(profiler.to_dict(), {})
+
+    def test_exports(self) -> None:
+        p = Profiler(enabled=True)
+        p.record("fork", 0.002, True)
+        p.record("fork", 0.2, False)
+        self.assertEqual(json.loads(p.to_json())["fork"]["calls"], 2)
+        text = p.to_prometheus()
+        self.assertIn('spot_tactics_calls_total{name="fork"} 2', text)
+        self.assertIn('spot_tactics_seconds_bucket{name="fork",le="+Inf"} 2', text)
+        self.assertIn('spot_tactics_seconds_bucket{name="fork",le="0.005"} 1', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+from profiles import candidate_splits, load_profile, parse_cpulist, plan_profiles
+
+class TestProfiles(unittest.TestCase):
+
+    def test_yaml_and_env(self) -> None:
+        with tempfile.NamedTemporaryFile("w", suffix = ".yaml", delete = False) as f:
+            f.write("threads: 4\nhash_mb: 512\nsyzygy_path: /tb\n")
+        try:
+            profile = load_profile(f.name, env = {"SPOT_TACTICS_HASH": "1024", "SPOT_TACTICS_MULTIPV": "2"})
+        finally:
+            os.unlink(f.name)
+        self.assertEqual(profile.threads, 4)
+        self.assertEqual(profile.hash_mb, 1024)
+        self.assertEqual(profile.multipv, 2)
+        self.assertEqual(profile.syzygy_path, "/tb")
+
+    def test_parse_cpulist(self) -> None:
+        self.assertEqual(parse_cpulist("0-3,8,10-11\n"), [0, 1, 2, 3, 8, 10, 11])
+
+    def test_plan_keeps_engines_on_one_node(self) -> None:
+        nodes = [list(range(0, 8)), list(range(8, 16))]
+        profiles = plan_profiles(4, nodes = nodes, memory_mb = 8192, pin = True)
+        self.assertEqual([p.cpus for p in profiles], [[0, 1, 2, 3], [8, 9, 10, 11], [4, 5, 6, 7], [12, 13, 14, 15]])
+        self.assertEqual({p.threads for p in profiles}, {4})
+        self.assertEqual({p.hash_mb for p in profiles}, {1024})
+
+    def test_plan_caps_threads(self) -> None:
+        profiles = plan_profiles(1, nodes = [list(range(32))], memory_mb = 4096)
+        self.assertEqual(profiles[0].threads, 6)
+        self.assertIsNone(profiles[0].cpus)
+
+    def test_candidate_splits(self) -> None:
+        self.assertEqual(candidate_splits(12), [(12, 1), (6, 2), (4, 3), (3, 4), (2, 5), (2, 6)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import re
+import unittest
+from chess import Board
+from admission import Admission
+from generator import Generator, descending
+from scheduler import Scheduler, expected_yield, material_diff
+from test_pipeline import FirstMoveEngine
+from test_admission import pgn
+from test_screen import MOVETEXT
+
+PGN = '[Event "Rated rapid game"]\n\n{}\n'.format(MOVETEXT)
+
+class Clock:
+    """ moves on a second every time it's read """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        self.now += 1
+        return self.now
+
+class TestScheduler(unittest.TestCase):
+
+    def test_expected_yield(self) -> None:
+        board = Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        self.assertGreater(expected_yield(board, 0.8, True), expected_yield(board, 0.3, True))
+        self.assertGreater(expected_yield(board, 0.3, True), expected_yield(board, 0.3, False))
+        lopsided = Board("4k3/8/8/8/8/8/8/QQQ1K3 w - - 0 1")
+        self.assertEqual(material_diff(lopsided), 27)
+        self.assertEqual(material_diff(lopsided.mirror()), 27)
+        self.assertLess(expected_yield(lopsided, 0.3, False), expected_yield(board, 0.3, False))
+        self.assertEqual(expected_yield(Board("7k/8/8/8/8/8/6q1/7K w - - 0 1"), 1.0, True), 0.0)
+        self.assertLessEqual(expected_yield(board, 2.0, True), 1.0)
+
+    def test_best_candidates_first_until_the_deadline(self) -> None:
+        everything = Generator(FirstMoveEngine(), scheduler = Scheduler()).generate(PGN)
+        self.assertGreater(len(everything), 2)
+        # every clock read is a second later: two candidates fit in three seconds
+        scheduler = Scheduler(budget = 3, clock = Clock())
+        engine = FirstMoveEngine()
+        gen = Generator(engine, scheduler = scheduler)
+        puzzles = gen.generate(PGN)
+        self.assertEqual(len(puzzles), 2)
+        self.assertEqual(engine.calls, scheduler.analysed)
+        ranked = sorted(gen.candidates(next(gen.games(PGN))), key = lambda candidate: descending(candidate.priority))
+        self.assertEqual([p.node.parent.board().fen() for p in puzzles], [c.board.fen() for c in ranked[:2]])
+
+    def test_tiers_outrank_coverage_and_yield(self) -> None:
+        # one tier stronger, but evals stop after ply 22 and its only candidate has no yield
+        strong = pgn("strong", "600+5", 1900, 1900)
+        cut = strong.index("12. Bh4")
+        strong = strong[:cut] + re.sub(r" \{ \[%eval [^}]*\] \}", "", strong[cut:])
+        weak = pgn("weak", "600+5", 1700, 1900)
+        scheduler = Scheduler()
+        yields = iter([1.0] * 8 + [0.0])
+        scheduler.score = lambda board, swing, capture: next(yields)
+        gen = Generator(FirstMoveEngine(), admission = Admission(), scheduler = scheduler)
+        order = [candidate.site for candidate in gen.ordered(gen.candidates(game) for game in gen.games(weak + strong))]
+        self.assertEqual(order, ['[Event "strong"]'] + ['[Event "weak"]'] * 8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from io import StringIO
+from chess.engine import Cp, Score
+from chess.pgn import read_game
+from generator import Generator, MISTAKE_THRESHOLD, PgnGame
+from screen import boards_at, candidate_plies, candidate_plies_batch, eval_arrays, parse_movetext
+
+MOVETEXT = "1. e4 { [%eval 0.18] } 1... e5 { [%eval 0.21] } 2. Nf3 { [%eval 0.13] } 2... d6 { [%eval 0.48] } 3. d4 { [%eval 0.58] } 3... Bg4 { [%eval 0.95] } 4. dxe5 { [%eval 0.88] } 4... Bxf3 { [%eval 1.44] } 5. Qxf3 { [%eval 1.31] } 5... dxe5 { [%eval 1.46] } 6. Bc4 { [%eval 1.68] } 6... Nf6 { [%eval 2.08] } 7. Nc3 { [%eval 0.78] } 7... Bb4 { [%eval 0.82] } 8. O-O { [%eval 1.29] } 8... Bxc3 { [%eval 1.48] } 9. Qxc3 { [%eval 1.65] } 9... O-O { [%eval 1.51] } 10. Bg5 { [%eval 0.92] } 10... Nbd7 { [%eval 1.15] } 11. Rad1 { [%eval 1.03] } 11... h6 { [%eval 4.89] } 12. Bh4 { [%eval 0.95] } 12... g5 { [%eval 1.62] } 13. Bg3 { [%eval 1.16] } 13... Nxe4 { [%eval 2.29] } 14. Qb3 { [%eval 0.45] } 14... Qe7 { [%eval 0.49] } 15. Rfe1 { [%eval -0.04] } 15... Ndc5 { [%eval 0.25] } 16. Qa3 { [%eval 0.19] } 16... Rad8 { [%eval 0.17] } 17. Rxe4 { [%eval -3.86] } 17... Rxd1+ { [%eval -3.84] } 18. Bf1 { [%eval -3.79] } 18... Qe6 { [%eval -0.2] } 19. Qxc5 { [%eval -0.28] } 19... Rfd8 { [%eval 1.63] } 20. Rxe5 { [%eval 0.99] } 20... Qxa2 { [%eval 1.79] } 21. f3 { [%eval 0.48] } 21... Qa1 { [%eval 1.44] } 22. Qf2 { [%eval 0.0] } 22... R8d2 { [%eval 1.56] } 23. Re8+ { [%eval 1.64] } 23... Kh7 { [%eval 1.94] } 24. Re2 { [%eval 1.66] } 24... Rd5 { [%eval 2.48] } 0-1"
+MATED = "1. e4 { [%eval 0.18] [%clk 0:05:00] } 1... f6?! $6 { [%eval 1.2] } ( 1... c5 { [%eval 0.3] } ) 2. d4 { [%eval 1.3] } 2... g5?? { [%eval #1] } 3. Qh5# { [%eval #0] } 1-0"
+
+class TestScreen(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.nodes = list(read_game(StringIO(MOVETEXT)).mainline())
+        cls.gen = Generator(None)
+
+    def scalar_candidates(self, nodes) -> list:
+        """ the per node loop the generator used to run """
+        found = []
+        prev_score: Score = Cp(20)
+        for ply, node in enumerate(nodes):
+            score = node.eval().pov(node.board().turn)
+            if self.gen.win_chances(score) > self.gen.win_chances(prev_score) + MISTAKE_THRESHOLD:
+                found.append(ply)
+            prev_score = -score
+        return found
+
+    def test_matches_scalar_loop(self) -> None:
+        cp, mate = eval_arrays(node.eval() for node in self.nodes)
+        expected = self.scalar_candidates(self.nodes)
+        self.assertTrue(expected)
+        self.assertEqual(list(candidate_plies(cp, mate, MISTAKE_THRESHOLD)), expected)
+
+    def test_batch_resets_between_games(self) -> None:
+        cp, mate = eval_arrays(node.eval() for node in self.nodes)
+        single = list(candidate_plies(cp, mate, MISTAKE_THRESHOLD))
+        batch = candidate_plies_batch([(cp, mate), (cp[:0], mate[:0]), (cp, mate)], MISTAKE_THRESHOLD)
+        self.assertEqual([list(b) for b in batch], [single, [], single])
+
+    def test_stops_at_missing_eval(self) -> None:
+        cp, _ = eval_arrays([node.eval() for node in self.nodes[:3]] + [None] + [node.eval() for node in self.nodes[4:]])
+        self.assertEqual(len(cp), 3)
+
+    def test_movetext_matches_game_tree(self) -> None:
+        sans, cp, mate = parse_movetext(MOVETEXT)
+        expected_cp, expected_mate = eval_arrays(node.eval() for node in self.nodes)
+        self.assertEqual(sans, [node.san() for node in self.nodes])
+        self.assertEqual(list(cp), list(expected_cp))
+        self.assertEqual(list(mate), list(expected_mate))
+        boards = boards_at(sans, [3, 10])
+        self.assertEqual(boards[10].fen(), self.nodes[10].board().fen())
+        self.assertEqual(sorted(boards), [3, 10])
+
+    def test_movetext_skips_variations_and_annotations(self) -> None:
+        sans, cp, mate = parse_movetext(MATED)
+        self.assertEqual(sans, ["e4", "f6", "d4", "g5", "Qh5#"])
+        self.assertEqual(list(cp), [18, 120, 130, 0, 0])
+        self.assertEqual(list(mate), [0, 0, 0, 1, 1])
+
+    def test_castling_with_zeros(self) -> None:
+        sans, cp, _ = parse_movetext(MOVETEXT.replace("8. O-O", "8. 0-0"))
+        self.assertEqual(sans, [node.san() for node in self.nodes])
+        self.assertEqual(len(cp), len(sans))
+        self.assertEqual(boards_at(sans, [47])[47].fen(), self.nodes[47].board().fen())
+
+    def test_mated_side_of_eval_zero(self) -> None:
+        _, mate = eval_arrays(node.eval() for node in read_game(StringIO(MATED)).mainline())
+        self.assertEqual(list(mate), [0, 0, 0, 1, 1])
+        black_mates = "1. f3 { [%eval -0.5] } 1... e5 { [%eval -0.4] } 2. g4 { [%eval #-1] } 2... Qh4# { [%eval #0] } 0-1"
+        _, mate = eval_arrays(node.eval() for node in read_game(StringIO(black_mates)).mainline())
+        self.assertEqual(list(mate), [0, 0, -1, -1])
+        self.assertEqual(list(parse_movetext(black_mates)[2]), [0, 0, -1, -1])
+
+    def test_malformed_movetext_skips_the_game(self) -> None:
+        broken = MOVETEXT.replace("6. Bc4", "6. Bc9")
+        self.assertEqual(self.gen.candidates(PgnGame('[Event "broken"]', broken)), [])
+        self.assertTrue(self.gen.candidates(PgnGame('[Event "fine"]', MOVETEXT)))
+
+if __name__ == '__main__':
+    unittest.main()
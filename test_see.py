@@ -0,0 +1,52 @@
+import unittest
+from chess import Board, WHITE, BLACK, ROOK, BB_SQUARES, parse_square
+from see import see, is_hanging, is_in_bad_spot
+
+class TestSee(unittest.TestCase):
+
+    def test_undefended_and_defended(self) -> None:
+        board = Board("4k3/8/8/3p4/4P3/8/8/4K3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), WHITE), 1)
+        board = Board("4k3/8/2p5/3p4/4P3/8/8/4K3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), WHITE), 0)
+
+    def test_xray(self) -> None:
+        # the second rook only recaptures through the first
+        board = Board("3rk3/8/8/3n4/8/8/3R4/3RK3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), WHITE), 3)
+        board = Board("3rk3/8/8/3n4/8/8/3R4/4K3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), WHITE), 0)
+        # the queen would take first and lose itself to the pawn
+        board = Board("4k3/8/4p3/3n4/8/8/3Q4/3RK3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), WHITE), 0)
+
+    def test_king_takes_only_when_safe(self) -> None:
+        board = Board("8/8/8/3pk3/8/8/8/3QK3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), WHITE), 0)
+        board = Board("8/8/2n5/3pk3/8/8/8/3QK3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), WHITE), 0)
+        board = Board("8/8/8/3Nk3/8/8/8/3RK3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), BLACK), 0)
+        board = Board("8/8/8/3Nk3/8/8/8/4K3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d5"), BLACK), 3)
+
+    def test_hanging_and_bad_spot(self) -> None:
+        # defended by a pawn but attacked by two: the knight is lost, not just in a bad spot
+        board = Board("1n1qk2r/r1p2ppp/3p4/P3pn2/1P1N4/2P5/3P1P1P/2B1KBNb b k - 0 13")
+        self.assertTrue(is_hanging(board, parse_square("d4")))
+        board = Board("4k3/8/8/3p4/4N3/8/8/4K3 w - - 0 1")
+        self.assertTrue(is_hanging(board, parse_square("e4")))
+        board = Board("4k3/8/8/3p4/4N3/5P2/8/4K3 w - - 0 1")
+        self.assertFalse(is_hanging(board, parse_square("e4")))
+        self.assertTrue(is_in_bad_spot(board, parse_square("e4")))
+        self.assertFalse(is_in_bad_spot(board, parse_square("f3")))
+
+    def test_virtual_occupancy(self) -> None:
+        # a rook looked at on d4 as if it came from d1, where it no longer defends from
+        board = Board("3qk3/8/8/8/8/8/8/3RK3 w - - 0 1")
+        self.assertEqual(see(board, parse_square("d4"), BLACK, ROOK), 0)
+        occupied = board.occupied & ~BB_SQUARES[parse_square("d1")]
+        self.assertEqual(see(board, parse_square("d4"), BLACK, ROOK, occupied), 5)
+
+if __name__ == '__main__':
+    unittest.main()
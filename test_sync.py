@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+from sync import LichessSync, game_timestamp, split_games
+
+def game(game_id: str, date: str, clock: str) -> str:
+    return f"""[Event "Rated blitz game"]
+[Site "https://lichess.org/{game_id}"]
+[UTCDate "{date}"]
+[UTCTime "{clock}"]
+[GameId "{game_id}"]
+
+1. e4 {{ [%eval 0.18] }} 1... e5 {{ [%eval 0.21] }} 1-0
+
+
+"""
+
+GAMES = [
+    game("aaaa1111", "2025.02.01", "10:00:00"),
+    game("bbbb2222", "2025.02.02", "10:00:00"),
+    game("cccc3333", "2025.02.03", "10:00:00"),
+]
+
+class FakeLichess(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        FakeLichess.requests.append((url.path, params))
+        since = int(params.get("since", 0))
+        body = "".join(g for g in GAMES if (game_timestamp(g) or 0) >= since).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-chess-pgn")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = HTTPServer(("127.0.0.1", 0), FakeLichess)
+        threading.Thread(target = self.server.serve_forever, daemon = True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.dir = tempfile.mkdtemp()
+        FakeLichess.requests = []
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_split_games(self) -> None:
+        texts = list(split_games("".join(GAMES).splitlines(keepends = True)))
+        self.assertEqual(len(texts), 3)
+        self.assertTrue(all(text.startswith("[Event") and text.endswith("1-0") for text in texts))
+
+    def test_only_new_games_are_requested(self) -> None:
+        state = os.path.join(self.dir, "sync.json")
+        first = list(LichessSync(state, self.url).games("kramford"))
+        self.assertEqual(len(first), 3)
+        self.assertNotIn("since", FakeLichess.requests[0][1])
+        self.assertEqual(FakeLichess.requests[0][0], "/api/games/user/kramford")
+        GAMES.append(game("dddd4444", "2025.02.04", "10:00:00"))
+        try:
+            second = list(LichessSync(state, self.url).games("kramford"))
+        finally:
+            GAMES.pop()
+        self.assertEqual(len(second), 1)
+        self.assertIn("dddd4444", second[0])
+        self.assertEqual(int(FakeLichess.requests[1][1]["since"]), (game_timestamp(GAMES[-1]) or 0) + 1000)
+
+    def test_sync_to_file(self) -> None:
+        path = os.path.join(self.dir, "kramford_games.pgn")
+        sync = LichessSync(os.path.join(self.dir, "sync.json"), self.url)
+        self.assertEqual(sync.sync_to_file("kramford", path), 3)
+        self.assertEqual(sync.sync_to_file("kramford", path), 0)
+        with open(path, encoding = "utf-8") as f:
+            self.assertEqual(f.read().count("[Event "), 3)
+
+    def test_interrupted_sync_loses_no_games(self) -> None:
+        path = os.path.join(self.dir, "kramford_games.pgn")
+        state = os.path.join(self.dir, "sync.json")
+        sync = LichessSync(state, self.url)
+        saves = []
+
+        def save() -> None:
+            # the state never gets ahead of the file: every game before since is on disk
+            with open(path, encoding = "utf-8") as f:
+                on_disk = f.read()
+            since = sync.since.get("kramford", 0)
+            self.assertTrue(all(g.split("\n")[1] in on_disk for g in GAMES if (game_timestamp(g) or 0) < since))
+            saves.append(since)
+            if len(saves) == 2:
+                raise KeyboardInterrupt()
+            LichessSync.save(sync)
+
+        sync.save = save
+        with mock.patch("sync.SAVE_EVERY", 1), self.assertRaises(KeyboardInterrupt):
+            sync.sync_to_file("kramford", path)
+        LichessSync(state, self.url).sync_to_file("kramford", path)
+        with open(path, encoding = "utf-8") as f:
+            text = f.read()
+        self.assertTrue(all(g.split("\n")[1] in text for g in GAMES))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from chess import Board, Move
+from chess.engine import Cp, Mate
+from tablebase import Tablebase
+
+class FakeTables:
+    """ KQ vs K: white wins unless the queen is gone """
+    wdl = {"KQvK": None}
+
+    def probe_wdl(self, board: Board) -> int:
+        if not board.queens:
+            return 0
+        return 2 if board.turn else -2
+
+    def probe_dtz(self, board: Board) -> int:
+        return self.probe_wdl(board) // 2 * (1 + len(board.move_stack))
+
+class TestTablebase(unittest.TestCase):
+
+    def test_missing_tables_fall_back_to_engine(self) -> None:
+        tablebase = Tablebase("/nonexistent/syzygy")
+        self.assertIsNone(tablebase.probe(Board("8/8/8/8/8/2k5/8/1QK5 w - - 0 1")))
+
+    def test_ranks_mates_then_wins(self) -> None:
+        tablebase = Tablebase(None)
+        tablebase.tables = FakeTables() # type: ignore
+        tablebase.max_pieces = 3
+        board = Board("k7/8/1K6/8/8/8/8/7Q w - - 0 1")
+        result = tablebase.probe(board)
+        assert result
+        self.assertEqual(result.best.score(), Mate(1))
+        self.assertEqual(result.best.move, Move.from_uci("h1h8"))
+        assert result.second
+        self.assertGreater(result.second.score(), Cp(0))
+        self.assertEqual(result.wdl, 2)
+        self.assertEqual(board.fen(), "k7/8/1K6/8/8/8/8/7Q w - - 0 1")
+
+    def test_skips_positions_with_too_many_pieces(self) -> None:
+        tablebase = Tablebase(None)
+        tablebase.tables = FakeTables() # type: ignore
+        tablebase.max_pieces = 3
+        self.assertIsNone(tablebase.probe(Board()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from chess import Board, Move
+from tag_cache import TagCache, cache_key
+
+E4 = [Move.from_uci("e2e4"), Move.from_uci("e7e5")]
+
+class TestTagCache(unittest.TestCase):
+
+    def test_transpositions_share_a_key(self) -> None:
+        a = Board()
+        for uci in ["g1f3", "g8f6", "b1c3"]:
+            a.push_uci(uci)
+        b = Board()
+        for uci in ["b1c3", "g8f6", "g1f3"]:
+            b.push_uci(uci)
+        self.assertEqual(cache_key(a, E4), cache_key(b, E4))
+        self.assertNotEqual(cache_key(a, E4), cache_key(a, E4[:1]))
+
+    def test_lru_and_cp_tags(self) -> None:
+        cache = TagCache(size = 2)
+        first, second, third = (cache_key(Board(), E4[:n]) for n in (0, 1, 2))
+        cache.put(first, ["crushing", "fork"])
+        cache.put(second, ["pin"])
+        self.assertEqual(cache.get(first), ["fork"])
+        cache.put(third, [])
+        self.assertIsNone(cache.get(second))
+        self.assertEqual(cache.get(first), ["fork"])
+        self.assertEqual(cache.get(third), [])
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_persisted(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "puzzles.db")
+            # the second hashes above 2^63, past sqlite's signed integers
+            keys = [cache_key(Board(), E4), cache_key(Board("8/8/8/8/8/8/8/K6k b - - 0 1"), [])]
+            cache = TagCache(path)
+            for key in keys:
+                cache.put(key, ["mateIn1", "mate", "fork"])
+            cache.close()
+            cache = TagCache(path, size = 1)
+            for key in keys:
+                self.assertEqual(cache.get(key), ["mateIn1", "mate", "fork"])
+            cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
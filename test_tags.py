@@ -0,0 +1,43 @@
+import sqlite3
+import unittest
+import numpy as np
+from tags import TAGS, Tag, add_mask_column, all_of, any_of, decode_tags, encode_tags, none_of, sql_filter, tag_counts
+
+class TestTags(unittest.TestCase):
+
+    def test_round_trip(self) -> None:
+        self.assertEqual(len(TAGS), 57)
+        self.assertEqual(decode_tags(encode_tags(["fork", "mateIn2", "zugzwang"])), ["fork", "mateIn2", "zugzwang"])
+        self.assertEqual(encode_tags(["advancedPawn"]), Tag.advancedPawn)
+        self.assertEqual(encode_tags([]), 0)
+        with self.assertRaises(KeyError):
+            encode_tags(["notATag"])
+
+    def test_queries(self) -> None:
+        mask = encode_tags(["fork", "mate", "mateIn2"])
+        self.assertTrue(any_of(mask, ["pin", "fork"]))
+        self.assertFalse(all_of(mask, ["pin", "fork"]))
+        self.assertTrue(all_of(mask, Tag.mate | Tag.fork))
+        self.assertTrue(none_of(mask, ["pin", "skewer"]))
+        masks = np.array([encode_tags(["fork"]), encode_tags(["pin", "fork"]), encode_tags(["zugzwang"])], dtype = np.uint64)
+        self.assertEqual(list(any_of(masks, ["fork"])), [True, True, False])
+        self.assertEqual(list(all_of(masks, ["pin", "fork"])), [False, True, False])
+        self.assertEqual(list(none_of(masks, ["zugzwang"])), [True, True, False])
+        counts = tag_counts(masks)
+        self.assertEqual((counts["fork"], counts["pin"], counts["zugzwang"], counts["mate"]), (2, 1, 1, 0))
+
+    def test_database(self) -> None:
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE puzzles (id INTEGER PRIMARY KEY AUTOINCREMENT, moves BLOB, cp INTEGER, tags TEXT, game BLOB)")
+        conn.executemany("INSERT INTO puzzles (tags) VALUES (?)", [("fork,pin",), ("zugzwang",), ("",)])
+        add_mask_column(conn)
+        add_mask_column(conn)
+        where, params = sql_filter(any_tags = ["fork", "zugzwang"], no_tags = ["pin"])
+        rows = conn.execute(f"SELECT tags FROM puzzles WHERE {where}", params).fetchall()
+        self.assertEqual(rows, [("zugzwang",)])
+        where, params = sql_filter(all_tags = ["fork", "pin"])
+        self.assertEqual(conn.execute(f"SELECT count(*) FROM puzzles WHERE {where}", params).fetchone(), (1,))
+        self.assertEqual(sql_filter(), ("1", []))
+
+if __name__ == '__main__':
+    unittest.main()
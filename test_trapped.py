@@ -0,0 +1,24 @@
+import unittest
+from chess import Board, parse_square
+from trapped import in_bad_spot, is_trapped
+
+class TestTrapped(unittest.TestCase):
+
+    def test_is_trapped_leaves_the_board_alone(self) -> None:
+        # the queen escapes by taking the rook, the old version returned with that move still pushed
+        board = Board("q3k3/7p/8/4N2q/3PP3/4B3/8/4K2R b - - 0 1")
+        fen = board.fen()
+        self.assertFalse(is_trapped(board, parse_square("h5")))
+        self.assertEqual(board.fen(), fen)
+        self.assertTrue(is_trapped(Board("q3k3/7p/8/4N2q/3PP3/4B3/7R/4K2R b - - 0 1"), parse_square("h5")))
+
+    def test_in_bad_spot_after_a_move(self) -> None:
+        board = Board("4k3/8/8/3p4/8/8/8/2B1K3 w - - 0 1")
+        bishop = board.piece_type_at(parse_square("c1"))
+        assert bishop
+        self.assertFalse(in_bad_spot(board, parse_square("c1"), True, bishop))
+        self.assertTrue(in_bad_spot(board, parse_square("e4"), True, bishop, moved_from = parse_square("c1")))
+        self.assertFalse(in_bad_spot(board, parse_square("f4"), True, bishop, moved_from = parse_square("c1")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+from typing import Optional
+
+
+def time_control_tier(line: str) -> Optional[int]:
+    if not line.startswith("[TimeControl "):
+        return None
+    try:
+        seconds, increment = line[1:][:-2].split()[1].replace("\"", "").split("+")
+        total = int(seconds) + int(increment) * 40
+        if total >= 480:
+            return 3
+        if total >= 180:
+            return 2
+        if total > 60:
+            return 1
+        return 0
+    except:
+        return 0
+
+
+def rating_tier(line: str) -> Optional[int]:
+    if not line.startswith("[WhiteElo ") and not line.startswith("[BlackElo "):
+        return None
+    try:
+        rating = int(line[11:15])
+        if rating > 1750:
+            return 3
+        if rating > 1600:
+            return 2
+        if rating > 1500:
+            return 1
+        return 0
+    except:
+        return 0
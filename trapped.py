@@ -0,0 +1,34 @@
+from typing import Optional
+from chess import Board, Color, PieceType, Square, BB_SQUARES, PAWN, KING
+from see import VALUES, see
+
+
+def in_bad_spot(board: Board, square: Square, color: Color, piece_type: PieceType, moved_from: Optional[Square] = None) -> bool:
+    """
+    A color piece_type on square the opponent wins material by taking.
+    With moved_from the piece is looked at as if it had just moved from there, without pushing the move.
+    """
+    gone = BB_SQUARES[moved_from] if moved_from is not None else 0
+    occupied = (board.occupied & ~gone) | BB_SQUARES[square]
+    return see(board, square, not color, piece_type, occupied) > 0
+
+
+def is_trapped(board: Board, square: Square) -> bool:
+    """ The piece on square is in a bad spot and every move it has lands in one too, or wins less than it's worth """
+    if board.is_check() or board.is_pinned(board.turn, square):
+        return False
+    piece = board.piece_at(square)
+    assert piece
+    if piece.piece_type in [PAWN, KING]:
+        return False
+    if not in_bad_spot(board, square, piece.color, piece.piece_type):
+        return False
+    value = VALUES[piece.piece_type]
+    # only the piece's own moves, and nothing is pushed to look at them
+    for escape in board.generate_legal_moves(BB_SQUARES[square]):
+        captured = board.piece_type_at(escape.to_square)
+        if captured and VALUES[captured] >= value:
+            return False
+        if not in_bad_spot(board, escape.to_square, piece.color, piece.piece_type, moved_from = square):
+            return False
+    return True